@@ -2,7 +2,7 @@ from synthesis import *
 from synthesis.fol.cegis import CEGISynthesizer
 
 
-group_theory = Parser.parse_theory(r"""
+theory_map = Parser.parse_theories(r"""
 theory GROUP
     sort Group
 
@@ -19,29 +19,15 @@ theory GROUP
     axiom forall x: Group. eq(mul(inv(x), x), id())
     axiom forall x: Group. eq(mul(x, inv(x)), id())
 end
-""")
-
-ab_group_theory = Parser.parse_theory(r"""
-theory ABELIAN_GROUP
-    sort Group
-
-    constant id: Group
-    function mul: Group Group -> Group
-    function inv: Group -> Group
-
-    relation eq: Group Group [smt("(= #1 #2)")]
 
-    axiom forall x: Group. eq(mul(x, id()), x)
-    axiom forall x: Group. eq(mul(id(), x), x)
-    
+theory ABELIAN_GROUP extending GROUP
     axiom forall x: Group, y: Group. eq(mul(x, y), mul(y, x))
-    
-    axiom forall x: Group, y: Group, z: Group. eq(mul(x, mul(y, z)), mul(mul(x, y), z))
-    axiom forall x: Group. eq(mul(inv(x), x), id())
-    axiom forall x: Group. eq(mul(x, inv(x)), id())
 end
 """)
 
+group_theory = theory_map["GROUP"]
+ab_group_theory = theory_map["ABELIAN_GROUP"]
+
 group_language = group_theory.language.get_sublanguage(
     ("Group",),
     ("id", "inv", "mul"),
@@ -293,6 +293,8 @@ def find_axioms_for_theory(
         separate_independence=args.separate_independence,
         use_enumeration=args.use_enumeration,
         model_size_bound=args.model_size_bound,
+        synthesis_rebuild_interval=args.synthesis_rebuild_interval,
+        counterexamples_per_query=args.counterexamples_per_query,
         check_soundness=True,
         stopwatch=stopwatch,
         # use_negative_examples=True,
@@ -778,6 +780,8 @@ def main() -> None:
     parser_synthesize.add_argument("--separate-independence", action="store_true", default=False, help="separate independence check from the synthesis query")
     parser_synthesize.add_argument("--disable-counterexamples", action="store_true", default=False, help="disable the use of counterexamples (i.e. do enumeration)")
     parser_synthesize.add_argument("--synthesis-timeout", type=int, default=None, help="synthesis timeout in seconds")
+    parser_synthesize.add_argument("--counterexamples-per-query", type=int, default=1, help="max number of distinct counterexamples (frames) to get from each counterexample query")
+    parser_synthesize.add_argument("--synthesis-rebuild-interval", type=int, default=0, help="rebuild the synthesis solver scope every n queries (0 for never)")
     # parser_synthesize.add_argument("--active-completeness", action="store_true", default=False, help="run completeness check every time a new axiom is found")
 
     # Render results in LaTeX
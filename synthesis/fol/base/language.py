@@ -4,13 +4,14 @@ Many-sorted language
 
 from __future__ import annotations
 
-from typing import Any, Tuple, Optional, Iterable
-from dataclasses import dataclass
+from typing import Any, Tuple, Optional, Iterable, Mapping, Dict, List, FrozenSet
+from dataclasses import dataclass, field
 
 from synthesis.smt import smt
 
 
-class BaseAST: ...
+class BaseAST:
+    __slots__ = ()
 
 
 @dataclass(frozen=True)
@@ -26,7 +27,7 @@ class Sort(BaseAST):
         return self.name
 
     def __eq__(self, other: Any) -> bool:
-        return isinstance(other, Sort) and self.name == other.name
+        return self is other or (isinstance(other, Sort) and self.name == other.name)
 
     def __hash__(self) -> int:
         return hash(self.name)
@@ -50,13 +51,23 @@ class FunctionSymbol(BaseAST):
         return f"{self.name}: {input_sort_string} -> {self.output_sort}"
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+
         return isinstance(other, FunctionSymbol) and \
+               self.name == other.name and \
                self.input_sorts == other.input_sorts and \
-               self.output_sort == other.output_sort and \
-               self.name == other.name
+               self.output_sort == other.output_sort
 
     def __hash__(self) -> int:
-        return hash(self.input_sorts) ^ hash(self.output_sort) ^ hash(self.name)
+        # cached since symbols are used as keys of interpretations
+        if "_hash" not in self.__dict__:
+            object.__setattr__(self, "_hash", hash(self.input_sorts) ^ hash(self.output_sort) ^ hash(self.name))
+        return self.__dict__["_hash"]
+
+    def __getstate__(self) -> Mapping[str, Any]:
+        # hashes of strings are not stable across processes
+        return { key: value for key, value in self.__dict__.items() if key != "_hash" }
 
 
 @dataclass(frozen=True)
@@ -76,12 +87,22 @@ class RelationSymbol(BaseAST):
         return f"{self.name}: {input_sort_string}"
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+
         return isinstance(other, RelationSymbol) and \
-               self.input_sorts == other.input_sorts and \
-               self.name == other.name
+               self.name == other.name and \
+               self.input_sorts == other.input_sorts
 
     def __hash__(self) -> int:
-        return hash(self.input_sorts) ^ hash(self.name)
+        # cached since symbols are used as keys of interpretations
+        if "_hash" not in self.__dict__:
+            object.__setattr__(self, "_hash", hash(self.input_sorts) ^ hash(self.name))
+        return self.__dict__["_hash"]
+
+    def __getstate__(self) -> Mapping[str, Any]:
+        # hashes of strings are not stable across processes
+        return { key: value for key, value in self.__dict__.items() if key != "_hash" }
 
 
 @dataclass(frozen=True)
@@ -93,6 +114,80 @@ class Language:
     function_symbols: Tuple[FunctionSymbol, ...]
     relation_symbols: Tuple[RelationSymbol, ...]
 
+    # indices computed in __post_init__
+    _sort_set: FrozenSet[Sort] = field(init=False, repr=False, compare=False)
+    _function_symbol_set: FrozenSet[FunctionSymbol] = field(init=False, repr=False, compare=False)
+    _relation_symbol_set: FrozenSet[RelationSymbol] = field(init=False, repr=False, compare=False)
+    _sorts_by_name: Dict[str, Sort] = field(init=False, repr=False, compare=False)
+    _function_symbols_by_name: Dict[str, FunctionSymbol] = field(init=False, repr=False, compare=False)
+    _relation_symbols_by_name: Dict[str, RelationSymbol] = field(init=False, repr=False, compare=False)
+    _function_symbol_indices: Dict[FunctionSymbol, Tuple[int, ...]] = field(init=False, repr=False, compare=False)
+    _relation_symbol_indices: Dict[RelationSymbol, int] = field(init=False, repr=False, compare=False)
+    _function_symbols_by_output_sort: Dict[Sort, Tuple[Tuple[int, FunctionSymbol], ...]] = field(init=False, repr=False, compare=False)
+    _nullary_function_symbols_by_output_sort: Dict[Sort, Tuple[Tuple[int, FunctionSymbol], ...]] = field(init=False, repr=False, compare=False)
+    _max_function_arity: int = field(init=False, repr=False, compare=False)
+    _max_relation_arity: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # indices for looking up symbols by name
+        # (the first symbol takes precedence in case of duplicate names)
+        sorts_by_name: Dict[str, Sort] = {}
+        function_symbols_by_name: Dict[str, FunctionSymbol] = {}
+        relation_symbols_by_name: Dict[str, RelationSymbol] = {}
+
+        # function symbols grouped by output sort, paired with
+        # their indices in self.function_symbols
+        function_symbols_by_output_sort: Dict[Sort, List[Tuple[int, FunctionSymbol]]] = {}
+
+        for sort in self.sorts:
+            sorts_by_name.setdefault(sort.name, sort)
+
+        for function_symbol in self.function_symbols:
+            function_symbols_by_name.setdefault(function_symbol.name, function_symbol)
+
+        # positions of symbols in self.function_symbols/relation_symbols
+        # (all occurrences for function symbols, and the first occurrence
+        # for relation symbols, same as tuple.index)
+        function_symbol_indices: Dict[FunctionSymbol, Tuple[int, ...]] = {}
+        relation_symbol_indices: Dict[RelationSymbol, int] = {}
+
+        for index, function_symbol in enumerate(self.function_symbols):
+            function_symbol_indices[function_symbol] = function_symbol_indices.get(function_symbol, ()) + (index,)
+            function_symbols_by_output_sort.setdefault(function_symbol.output_sort, []).append((index, function_symbol))
+
+        for relation_symbol in self.relation_symbols:
+            relation_symbols_by_name.setdefault(relation_symbol.name, relation_symbol)
+
+        for index, relation_symbol in enumerate(self.relation_symbols):
+            relation_symbol_indices.setdefault(relation_symbol, index)
+
+        # symbol sets for membership tests
+        object.__setattr__(self, "_sort_set", frozenset(self.sorts))
+        object.__setattr__(self, "_function_symbol_set", frozenset(self.function_symbols))
+        object.__setattr__(self, "_relation_symbol_set", frozenset(self.relation_symbols))
+
+        object.__setattr__(self, "_sorts_by_name", sorts_by_name)
+        object.__setattr__(self, "_function_symbols_by_name", function_symbols_by_name)
+        object.__setattr__(self, "_relation_symbols_by_name", relation_symbols_by_name)
+        object.__setattr__(self, "_function_symbol_indices", function_symbol_indices)
+        object.__setattr__(self, "_relation_symbol_indices", relation_symbol_indices)
+        object.__setattr__(self, "_function_symbols_by_output_sort", {
+            sort: tuple(symbols) for sort, symbols in function_symbols_by_output_sort.items()
+        })
+        object.__setattr__(self, "_nullary_function_symbols_by_output_sort", {
+            sort: tuple((index, symbol) for index, symbol in symbols if len(symbol.input_sorts) == 0)
+            for sort, symbols in function_symbols_by_output_sort.items()
+        })
+
+        # max arities are queried for every node when building templates
+        object.__setattr__(self, "_max_function_arity", max(tuple(len(symbol.input_sorts) for symbol in self.function_symbols) + (0,)))
+        object.__setattr__(self, "_max_relation_arity", max(tuple(len(symbol.input_sorts) for symbol in self.relation_symbols) + (0,)))
+
+    def __setstate__(self, state: Mapping[str, Any]) -> None:
+        # rebuild the indices (which may be missing in older pickles)
+        self.__dict__.update(state)
+        self.__post_init__()
+
     def strip_smt_hook(self) -> Language:
         return Language(
             tuple(sort.strip_smt_hook() for sort in self.sorts),
@@ -106,8 +201,6 @@ class Language:
         relation_symbol_string = ", ".join(map(str, self.relation_symbols))
         return f"({sort_string}; {function_symbol_string}; {relation_symbol_string})"
 
-    # TODO: add dict for sorts/functions/relations
-
     def get_sublanguage(
         self,
         sort_names: Iterable[str],
@@ -143,37 +236,65 @@ class Language:
         assert False
 
     def get_sort(self, name: str) -> Sort:
-        for sort in self.sorts:
-            if sort.name == name:
-                return sort
-        assert False, f"unable to find sort {name}"
+        assert name in self._sorts_by_name, f"unable to find sort {name}"
+        return self._sorts_by_name[name]
 
     def get_function_symbol(self, name: str) -> FunctionSymbol:
-        for symbol in self.function_symbols:
-            if symbol.name == name:
-                return symbol
-        assert False, f"unable to find function {name}"
+        assert name in self._function_symbols_by_name, f"unable to find function {name}"
+        return self._function_symbols_by_name[name]
 
     def get_relation_symbol(self, name: str) -> RelationSymbol:
-        for symbol in self.relation_symbols:
-            if symbol.name == name:
-                return symbol
-        assert False, f"unable to find relation {name}"
+        assert name in self._relation_symbols_by_name, f"unable to find relation {name}"
+        return self._relation_symbols_by_name[name]
+
+    def get_function_symbols_of_output_sort(self, sort: Sort) -> Tuple[Tuple[int, FunctionSymbol], ...]:
+        """
+        Get all function symbols with the given output sort,
+        each paired with its index in self.function_symbols
+        """
+        return self._function_symbols_by_output_sort.get(sort, ())
+
+    def get_nullary_function_symbols_of_output_sort(self, sort: Sort) -> Tuple[Tuple[int, FunctionSymbol], ...]:
+        """
+        Same as get_function_symbols_of_output_sort but only for constant symbols
+        """
+        return self._nullary_function_symbols_by_output_sort.get(sort, ())
+
+    def get_function_symbol_indices(self, symbol: FunctionSymbol) -> Tuple[int, ...]:
+        """
+        All indices of the symbol in self.function_symbols (empty if it does not exist)
+        """
+        return self._function_symbol_indices.get(symbol, ())
+
+    def get_relation_symbol_index(self, symbol: RelationSymbol) -> Optional[int]:
+        """
+        Index of the symbol in self.relation_symbols, or None if it does not exist
+        """
+        return self._relation_symbol_indices.get(symbol)
+
+    def has_sort(self, sort: Sort) -> bool:
+        return sort in self._sort_set
+
+    def has_function_symbol(self, symbol: FunctionSymbol) -> bool:
+        return symbol in self._function_symbol_set
+
+    def has_relation_symbol(self, symbol: RelationSymbol) -> bool:
+        return symbol in self._relation_symbol_set
 
     def get_max_function_arity(self) -> int:
-        return max(tuple(len(symbol.input_sorts) for symbol in self.function_symbols) + (0,))
+        return self._max_function_arity
 
     def get_max_relation_arity(self) -> int:
-        return max(tuple(len(symbol.input_sorts) for symbol in self.relation_symbols) + (0,))
+        return self._max_relation_arity
 
     def expand(self, other: Language) -> Language:
         """
         Add new sort/function/relation symbols from the given language
         """
 
-        new_sorts = tuple(sort for sort in other.sorts if sort not in self.sorts)
-        new_functions = tuple(function for function in other.function_symbols if function not in self.function_symbols)
-        new_relations = tuple(relation for relation in other.relation_symbols if relation not in self.relation_symbols)
+        new_sorts = tuple(sort for sort in other.sorts if not self.has_sort(sort))
+        new_functions = tuple(function for function in other.function_symbols if not self.has_function_symbol(function))
+        new_relations = tuple(relation for relation in other.relation_symbols if not self.has_relation_symbol(relation))
 
         return Language(
             self.sorts + new_sorts,
@@ -182,7 +303,7 @@ class Language:
         )
 
     def expand_with_function(self, symbol: FunctionSymbol) -> Language:
-        if symbol in self.function_symbols:
+        if self.has_function_symbol(symbol):
             return self
             
         return Language(
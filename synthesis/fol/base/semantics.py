@@ -47,6 +47,12 @@ class Structure(ABC):
     @abstractmethod
     def interpret_relation(self, symbol: RelationSymbol, *arguments: smt.SMTTerm) -> smt.SMTTerm: ...
 
+    def get_relation_interpretation(self, symbol: RelationSymbol) -> smt.SMTFunction:
+        """
+        Get the interpretation of a relation symbol as a function on SMT terms
+        """
+        return lambda *arguments: self.interpret_relation(symbol, *arguments)
+
     def get_smt_sort(self, sort: Sort) -> smt.SMTSort:
         return self.interpret_sort(sort).get_smt_sort()
 
@@ -170,6 +176,13 @@ class SymbolicStructure(Structure):
 
         return self.relation_interpretations[symbol](*arguments)
 
+    def get_relation_interpretation(self, symbol: RelationSymbol) -> smt.SMTFunction:
+        if symbol not in self.relation_interpretations:
+            assert symbol.smt_hook is not None, f"unable to interpret relation symbol {symbol}"
+            return symbol.smt_hook
+
+        return self.relation_interpretations[symbol]
+
     def get_domain_of_sorts(self, sorts: Tuple[Sort, ...]) -> Tuple[Tuple[smt.SMTTerm, ...], ...]:
         """
         Generate all elements in the domain of the product of the given sorts
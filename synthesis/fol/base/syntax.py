@@ -4,11 +4,14 @@ Syntax of many-sorted first-order logic
 
 from __future__ import annotations
 
-from typing import TypeVar, Generic, Tuple, Union, Mapping, Set, Any
+from typing import TypeVar, Generic, Tuple, List, Dict, Union, Mapping, Set, AbstractSet, FrozenSet, Any, Callable, ClassVar, Optional
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 from collections import OrderedDict
 
+import functools
+import weakref
+
 from synthesis.smt import smt
 from synthesis.template import Template
 
@@ -17,20 +20,82 @@ from .semantics import Structure
 
 
 _T = TypeVar("_T")
+_S = TypeVar("_S")
+
+
+def _cache_on_node(method: Callable[[_S], _T]) -> Callable[[_S], _T]:
+    """
+    Memoize a nullary method of an immutable AST node on the node itself
+    """
+    attribute = f"_cached_{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(self: _S) -> _T:
+        try:
+            return getattr(self, attribute) # type: ignore
+        except AttributeError:
+            value = method(self)
+            # nodes are frozen dataclasses
+            object.__setattr__(self, attribute, value)
+            return value
+
+    return wrapper
+
+
+def _conjoin_constraints(*constraints: smt.SMTTerm) -> smt.SMTTerm:
+    """
+    Conjunction of template constraints, dropping the trivial ones
+    (constraints of concrete nodes are always true)
+    """
+    return smt.And(*(constraint for constraint in constraints if not constraint.is_true()))
 
 
 class Interpretable(Generic[_T], ABC):
+    __slots__ = ()
+
     @abstractmethod
     def substitute(self, substitution: Mapping[Variable, Term]) -> _T: ...
 
     @abstractmethod
-    def get_free_variables(self) -> Set[Variable]: ...
+    def get_free_variables(self) -> AbstractSet[Variable]:
+        """
+        NOTE: the result may be shared and should not be mutated
+        """
+        ...
 
     @abstractmethod
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm: ...
 
+    def is_concrete(self) -> bool:
+        """
+        Returns True if the AST contains no template,
+        in which case get_from_smt_model is the identity
+        """
+        return False
+
+    def __getstate__(self) -> Mapping[str, Any]:
+        state = {}
+
+        # concrete nodes use __slots__ while templates use __dict__
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if name != "__weakref__" and hasattr(self, name):
+                    state[name] = getattr(self, name)
+
+        state.update(getattr(self, "__dict__", {}))
+
+        # results memoized by _cache_on_node may refer back to the node itself
+        return { key: value for key, value in state.items() if not key.startswith("_cached_") }
+
+    def __setstate__(self, state: Mapping[str, Any]) -> None:
+        # nodes are frozen dataclasses
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+
 
 class Term(BaseAST, Template["Term"], Interpretable["Term"], ABC):
+    __slots__ = ()
+
     def equals(self, value: Term) -> smt.SMTTerm:
         raise NotImplementedError()
 
@@ -49,6 +114,8 @@ class Term(BaseAST, Template["Term"], Interpretable["Term"], ABC):
 
 
 class Formula(BaseAST, Template["Formula"], Interpretable["Formula"], ABC):
+    __slots__ = ()
+
     def equals(self, value: Formula) -> smt.SMTTerm:
         raise NotImplementedError()
 
@@ -80,14 +147,40 @@ class Formula(BaseAST, Template["Formula"], Interpretable["Formula"], ABC):
 
 @dataclass(frozen=True)
 class Variable(Term):
+    __slots__ = ("name", "sort", "_cached_get_free_variables", "__weakref__")
+
     name: str
     sort: Sort
 
+    # live variables interned by name and sort object
+    # (sorts are compared by name only, so the identity of the sort is part of the key)
+    # NOTE: unpickling creates a new sort object, so an unpickled variable is equal
+    # to but not the same object as the original; variables unpickled together
+    # (e.g. in the same formula) share the sort and hence are still interned
+    _interned: ClassVar[weakref.WeakValueDictionary] = weakref.WeakValueDictionary()
+
+    def __new__(cls, name: Optional[str] = None, sort: Optional[Sort] = None) -> Variable:
+        # no arguments are given when unpickling from older pickles
+        if name is None or sort is None:
+            return super().__new__(cls)
+
+        key = name, id(sort)
+        variable = cls._interned.get(key)
+
+        if variable is None:
+            variable = super().__new__(cls)
+            cls._interned[key] = variable
+
+        return variable
+
+    def __getnewargs__(self) -> Tuple[str, Sort]:
+        return self.name, self.sort
+
     def strip_smt_hook(self) -> Variable:
         return Variable(self.name, self.sort.strip_smt_hook())
 
     def is_in_language(self, language: Language) -> bool:
-        return self.sort in language.sorts
+        return language.has_sort(self.sort)
 
     def __str__(self) -> str:
         return f"{self.name}:{self.sort}"
@@ -97,8 +190,9 @@ class Variable(Term):
             return substitution[self]
         return self
 
-    def get_free_variables(self) -> Set[Variable]:
-        return { self }
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset({ self })
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         assert self in valuation, \
@@ -108,6 +202,9 @@ class Variable(Term):
     def get_constraint(self) -> smt.SMTTerm:
         return smt.TRUE()
 
+    def is_concrete(self) -> bool:
+        return True
+
     def get_from_smt_model(self, model: smt.SMTModel) -> Term:
         return self
 
@@ -120,6 +217,8 @@ class Variable(Term):
 
 @dataclass(frozen=True)
 class Application(Term):
+    __slots__ = ("function_symbol", "arguments", "_cached_get_free_variables", "_cached_is_concrete")
+
     function_symbol: FunctionSymbol
     arguments: Tuple[Term, ...]
 
@@ -130,7 +229,7 @@ class Application(Term):
         )
 
     def is_in_language(self, language: Language) -> bool:
-        if self.function_symbol not in language.function_symbols:
+        if not language.has_function_symbol(self.function_symbol):
             return False
 
         for argument in self.arguments:
@@ -144,13 +243,13 @@ class Application(Term):
         return f"{self.function_symbol.name}({argument_string})"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Term:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Application(self.function_symbol, tuple(argument.substitute(substitution) for argument in self.arguments))
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = set()
-        for argument in self.arguments:
-            free_vars.update(argument.get_free_variables())
-        return free_vars
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(*(argument.get_free_variables() for argument in self.arguments))
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         return structure.interpret_function(
@@ -159,7 +258,11 @@ class Application(Term):
         )
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(*(argument.get_constraint() for argument in self.arguments))
+        return _conjoin_constraints(*(argument.get_constraint() for argument in self.arguments))
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return all(argument.is_concrete() for argument in self.arguments)
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Term:
         return self
@@ -181,14 +284,24 @@ class Application(Term):
 
 @dataclass(frozen=True)
 class Falsum(Formula):
+    __slots__ = ()
+
+    _instance: ClassVar[Falsum]
+
+    def __new__(cls) -> Falsum:
+        # there is only one falsum
+        if "_instance" not in cls.__dict__:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
     def __str__(self) -> str:
         return "⊥"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
         return self
 
-    def get_free_variables(self) -> Set[Variable]:
-        return set()
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset()
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         return smt.FALSE()
@@ -196,6 +309,9 @@ class Falsum(Formula):
     def get_constraint(self) -> smt.SMTTerm:
         return smt.TRUE()
 
+    def is_concrete(self) -> bool:
+        return True
+
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
         return self
 
@@ -208,14 +324,24 @@ class Falsum(Formula):
 
 @dataclass(frozen=True)
 class Verum(Formula):
+    __slots__ = ()
+
+    _instance: ClassVar[Verum]
+
+    def __new__(cls) -> Verum:
+        # there is only one verum
+        if "_instance" not in cls.__dict__:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
     def __str__(self) -> str:
         return "⊤"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
         return self
 
-    def get_free_variables(self) -> Set[Variable]:
-        return set()
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset()
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         return smt.TRUE()
@@ -223,6 +349,9 @@ class Verum(Formula):
     def get_constraint(self) -> smt.SMTTerm:
         return smt.TRUE()
 
+    def is_concrete(self) -> bool:
+        return True
+
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
         return self
 
@@ -235,6 +364,8 @@ class Verum(Formula):
 
 @dataclass(frozen=True)
 class RelationApplication(Formula):
+    __slots__ = ("relation_symbol", "arguments", "_cached_get_free_variables", "_cached_is_concrete")
+
     relation_symbol: RelationSymbol
     arguments: Tuple[Term, ...]
 
@@ -243,13 +374,13 @@ class RelationApplication(Formula):
         return f"{self.relation_symbol.name}({argument_string})"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return RelationApplication(self.relation_symbol, tuple(argument.substitute(substitution) for argument in self.arguments))
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = set()
-        for argument in self.arguments:
-            free_vars.update(argument.get_free_variables())
-        return free_vars
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(*(argument.get_free_variables() for argument in self.arguments))
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         return structure.interpret_relation(
@@ -258,9 +389,16 @@ class RelationApplication(Formula):
         )
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(*(argument.get_constraint() for argument in self.arguments))
+        return _conjoin_constraints(*(argument.get_constraint() for argument in self.arguments))
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return all(argument.is_concrete() for argument in self.arguments)
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return RelationApplication(
             self.relation_symbol,
             tuple(argument.get_from_smt_model(model) for argument in self.arguments),
@@ -277,6 +415,8 @@ class RelationApplication(Formula):
 
 @dataclass(frozen=True)
 class Equality(Formula):
+    __slots__ = ("left", "right", "_cached_get_free_variables", "_cached_is_concrete")
+
     left: Term
     right: Term
 
@@ -288,13 +428,16 @@ class Equality(Formula):
         return f"{self.left} = {self.right}"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Equality(
             self.left.substitute(substitution),
             self.right.substitute(substitution),
         )
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.left.get_free_variables().union(self.right.get_free_variables())
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(self.left.get_free_variables(), self.right.get_free_variables())
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         return smt.Equals(
@@ -303,9 +446,16 @@ class Equality(Formula):
         )
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.left.get_constraint(), self.right.get_constraint())
+        return _conjoin_constraints(self.left.get_constraint(), self.right.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.left.is_concrete() and self.right.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return Equality(
             self.left.get_from_smt_model(model),
             self.right.get_from_smt_model(model),
@@ -328,6 +478,8 @@ AtomicFormula = Union[Verum, Falsum, RelationApplication, Equality]
 
 @dataclass(frozen=True)
 class Conjunction(Formula):
+    __slots__ = ("left", "right", "_cached_get_conjuncts", "_cached_get_free_variables", "_cached_is_concrete")
+
     left: Formula
     right: Formula
 
@@ -346,25 +498,51 @@ class Conjunction(Formula):
     def __str__(self) -> str:
         return f"({self.left} /\\ {self.right})"
 
+    @_cache_on_node
+    def get_conjuncts(self) -> Tuple[Formula, ...]:
+        """
+        Flatten nested conjunctions into a tuple of conjuncts (from left to right)
+        """
+        conjuncts: List[Formula] = []
+        stack: List[Formula] = [self]
+
+        while len(stack) != 0:
+            formula = stack.pop()
+
+            if isinstance(formula, Conjunction):
+                stack.append(formula.right)
+                stack.append(formula.left)
+            else:
+                conjuncts.append(formula)
+
+        return tuple(conjuncts)
+
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Conjunction(
             self.left.substitute(substitution),
             self.right.substitute(substitution),
         )
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.left.get_free_variables().union(self.right.get_free_variables())
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(self.left.get_free_variables(), self.right.get_free_variables())
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        return smt.And(
-            self.left.interpret(structure, valuation),
-            self.right.interpret(structure, valuation),
-        )
+        return _interpret_connectives(self, structure, valuation)
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.left.get_constraint(), self.right.get_constraint())
+        return _conjoin_constraints(self.left.get_constraint(), self.right.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.left.is_concrete() and self.right.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return Conjunction(
             self.left.get_from_smt_model(model),
             self.right.get_from_smt_model(model),
@@ -384,6 +562,8 @@ class Conjunction(Formula):
 
 @dataclass(frozen=True)
 class Disjunction(Formula):
+    __slots__ = ("left", "right", "_cached_get_disjuncts", "_cached_get_free_variables", "_cached_is_concrete")
+
     left: Formula
     right: Formula
 
@@ -402,25 +582,51 @@ class Disjunction(Formula):
     def __str__(self) -> str:
         return f"({self.left} \\/ {self.right})"
 
+    @_cache_on_node
+    def get_disjuncts(self) -> Tuple[Formula, ...]:
+        """
+        Flatten nested disjunctions into a tuple of disjuncts (from left to right)
+        """
+        disjuncts: List[Formula] = []
+        stack: List[Formula] = [self]
+
+        while len(stack) != 0:
+            formula = stack.pop()
+
+            if isinstance(formula, Disjunction):
+                stack.append(formula.right)
+                stack.append(formula.left)
+            else:
+                disjuncts.append(formula)
+
+        return tuple(disjuncts)
+
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Disjunction(
             self.left.substitute(substitution),
             self.right.substitute(substitution),
         )
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.left.get_free_variables().union(self.right.get_free_variables())
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(self.left.get_free_variables(), self.right.get_free_variables())
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        return smt.Or(
-            self.left.interpret(structure, valuation),
-            self.right.interpret(structure, valuation),
-        )
+        return _interpret_connectives(self, structure, valuation)
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.left.get_constraint(), self.right.get_constraint())
+        return _conjoin_constraints(self.left.get_constraint(), self.right.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.left.is_concrete() and self.right.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return Disjunction(
             self.left.get_from_smt_model(model),
             self.right.get_from_smt_model(model),
@@ -440,24 +646,36 @@ class Disjunction(Formula):
 
 @dataclass(frozen=True)
 class Negation(Formula):
+    __slots__ = ("formula", "_cached_get_free_variables", "_cached_is_concrete")
+
     formula: Formula
 
     def __str__(self) -> str:
         return f"¬{self.formula}"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Negation(self.formula.substitute(substitution))
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.formula.get_free_variables()
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset(self.formula.get_free_variables())
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        return smt.Not(self.formula.interpret(structure, valuation))
+        return _interpret_connectives(self, structure, valuation)
 
     def get_constraint(self) -> smt.SMTTerm:
         return self.formula.get_constraint()
 
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.formula.is_concrete()
+
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return Negation(self.formula.get_from_smt_model(model))
 
     def equals(self, value: Formula) -> smt.SMTTerm:
@@ -471,6 +689,8 @@ class Negation(Formula):
 
 @dataclass(frozen=True)
 class Implication(Formula):
+    __slots__ = ("left", "right", "_cached_get_free_variables", "_cached_is_concrete")
+
     left: Formula
     right: Formula
 
@@ -478,24 +698,31 @@ class Implication(Formula):
         return f"({self.left} -> {self.right})"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Implication(
             self.left.substitute(substitution),
             self.right.substitute(substitution),
         )
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.left.get_free_variables().union(self.right.get_free_variables())
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(self.left.get_free_variables(), self.right.get_free_variables())
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        return smt.Implies(
-            self.left.interpret(structure, valuation),
-            self.right.interpret(structure, valuation),
-        )
+        return _interpret_connectives(self, structure, valuation)
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.left.get_constraint(), self.right.get_constraint())
+        return _conjoin_constraints(self.left.get_constraint(), self.right.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.left.is_concrete() and self.right.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return Implication(
             self.left.get_from_smt_model(model),
             self.right.get_from_smt_model(model),
@@ -515,6 +742,8 @@ class Implication(Formula):
 
 @dataclass(frozen=True)
 class Equivalence(Formula):
+    __slots__ = ("left", "right", "_cached_get_free_variables", "_cached_is_concrete")
+
     left: Formula
     right: Formula
 
@@ -522,24 +751,31 @@ class Equivalence(Formula):
         return f"({self.left} <-> {self.right})"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         return Equivalence(
             self.left.substitute(substitution),
             self.right.substitute(substitution),
         )
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.left.get_free_variables().union(self.right.get_free_variables())
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset().union(self.left.get_free_variables(), self.right.get_free_variables())
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        return smt.Iff(
-            self.left.interpret(structure, valuation),
-            self.right.interpret(structure, valuation),
-        )
+        return _interpret_connectives(self, structure, valuation)
     
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.left.get_constraint(), self.right.get_constraint())
+        return _conjoin_constraints(self.left.get_constraint(), self.right.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.left.is_concrete() and self.right.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return Equivalence(
             self.left.get_from_smt_model(model),
             self.right.get_from_smt_model(model),
@@ -559,6 +795,8 @@ class Equivalence(Formula):
 
 @dataclass(frozen=True)
 class UniversalQuantification(Formula):
+    __slots__ = ("variable", "body", "_cached_get_free_variables", "_cached_is_concrete")
+
     variable: Variable
     body: Formula
 
@@ -566,12 +804,15 @@ class UniversalQuantification(Formula):
         return f"(forall {self.variable}. {self.body})"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         if self.variable in substitution:
             substitution = { k: v for k, v in substitution.items() if k != self.variable }
         return UniversalQuantification(self.variable, self.body.substitute(substitution))
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.body.get_free_variables().difference({ self.variable })
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset(self.body.get_free_variables() - { self.variable })
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         carrier = structure.interpret_sort(self.variable.sort)
@@ -584,9 +825,16 @@ class UniversalQuantification(Formula):
         return carrier.universally_quantify(smt_var, interp)
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.variable.get_constraint(), self.body.get_constraint())
+        return _conjoin_constraints(self.variable.get_constraint(), self.body.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.body.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return UniversalQuantification(
             self.variable,
             self.body.get_from_smt_model(model),
@@ -607,6 +855,8 @@ class UniversalQuantification(Formula):
 
 @dataclass(frozen=True)
 class ExistentialQuantification(Formula):
+    __slots__ = ("variable", "body", "_cached_get_free_variables", "_cached_is_concrete")
+
     variable: Variable
     body: Formula
 
@@ -614,12 +864,15 @@ class ExistentialQuantification(Formula):
         return f"(exists {self.variable}. {self.body})"
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> Formula:
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
         if self.variable in substitution:
             substitution = { k: v for k, v in substitution.items() if k != self.variable }
         return ExistentialQuantification(self.variable, self.body.substitute(substitution))
 
-    def get_free_variables(self) -> Set[Variable]:
-        return self.body.get_free_variables().difference({ self.variable })
+    @_cache_on_node
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        return frozenset(self.body.get_free_variables() - { self.variable })
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         carrier = structure.interpret_sort(self.variable.sort)
@@ -632,9 +885,16 @@ class ExistentialQuantification(Formula):
         return carrier.existentially_quantify(smt_var, interp)
 
     def get_constraint(self) -> smt.SMTTerm:
-        return smt.And(self.variable.get_constraint(), self.body.get_constraint())
+        return _conjoin_constraints(self.variable.get_constraint(), self.body.get_constraint())
+
+    @_cache_on_node
+    def is_concrete(self) -> bool:
+        return self.body.is_concrete()
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        if self.is_concrete():
+            return self
+
         return ExistentialQuantification(
             self.variable,
             self.body.get_from_smt_model(model),
@@ -648,3 +908,76 @@ class ExistentialQuantification(Formula):
 
     def is_qfree(self) -> bool:
         return False
+
+
+def _get_connective_operands(formula: Formula) -> Optional[Tuple[Formula, ...]]:
+    """
+    Operands of a propositional connective, or None if the formula is not one
+    (chains of conjunctions/disjunctions are treated as single n-ary conjunctions/disjunctions)
+    """
+    if isinstance(formula, Conjunction):
+        return formula.get_conjuncts()
+
+    if isinstance(formula, Disjunction):
+        return formula.get_disjuncts()
+
+    if isinstance(formula, Negation):
+        return formula.formula,
+
+    if isinstance(formula, (Implication, Equivalence)):
+        return formula.left, formula.right
+
+    return None
+
+
+def _combine_connective_interpretations(formula: Formula, operands: Tuple[smt.SMTTerm, ...]) -> smt.SMTTerm:
+    if isinstance(formula, Conjunction):
+        return smt.And(*operands)
+
+    if isinstance(formula, Disjunction):
+        return smt.Or(*operands)
+
+    if isinstance(formula, Negation):
+        return smt.Not(*operands)
+
+    if isinstance(formula, Implication):
+        return smt.Implies(*operands)
+
+    assert isinstance(formula, Equivalence)
+    return smt.Iff(*operands)
+
+
+def _interpret_connectives(formula: Formula, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
+    """
+    Interpret the propositional structure of a formula in post-order using an explicit stack
+    (instead of recursing through interpret); other formulas are interpreted with their own interpret
+
+    Interpretations are indexed by the id of the node, so a node shared by multiple parents
+    is only interpreted once
+    """
+    interpretations: Dict[int, smt.SMTTerm] = {}
+    stack: List[Tuple[Formula, bool]] = [ (formula, False) ]
+
+    while len(stack) != 0:
+        node, expanded = stack.pop()
+
+        if not expanded and id(node) in interpretations:
+            continue
+
+        operands = _get_connective_operands(node)
+
+        if operands is None:
+            interpretations[id(node)] = node.interpret(structure, valuation)
+
+        elif not expanded:
+            # visit the node again after all of its operands
+            stack.append((node, True))
+            stack.extend((operand, False) for operand in reversed(operands))
+
+        else:
+            interpretations[id(node)] = _combine_connective_interpretations(
+                node,
+                tuple(interpretations[id(operand)] for operand in operands),
+            )
+
+    return interpretations[id(formula)]
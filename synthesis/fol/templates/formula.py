@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import Tuple, Mapping, Callable, Optional, Dict, overload, Generator
+from typing import TypeVar, Generic, Tuple, List, Mapping, Callable, Optional, Dict, FrozenSet, overload, Generator
 from collections import OrderedDict
 
+import copy
+
 from synthesis.smt import smt
 from synthesis.template import Template, BoundedIntegerVariable, UnionTemplate
 
@@ -20,29 +22,58 @@ class TermTemplate(Term):
         self.depth = depth
         self.sort = sort
         
-        self.substitution: Dict[Variable, Term] = OrderedDict({ var: var for var in self.free_vars })
+        # self.free_var_terms[i] is the term substituted for self.free_vars[i]
+        self.free_var_terms: Tuple[Term, ...] = self.free_vars
 
         self.node = BoundedIntegerVariable(0, len(self.free_vars) + len(self.language.function_symbols))
 
-        if depth != 0:
-            self.subterms = tuple(TermTemplate(language, self.free_vars, depth - 1) for _ in range(language.get_max_function_arity()))
-        else:
-            self.subterms = ()
+        # built on first access (see self.subterms), since e.g.
+        # enumerate() never needs the subtree of control variables
+        self._subterms: Optional[Tuple[TermTemplate, ...]] = None
+
+        self._clear_cache()
+
+    @property
+    def subterms(self) -> Tuple[TermTemplate, ...]:
+        if self._subterms is None:
+            if self.depth != 0:
+                self._subterms = tuple(
+                    TermTemplate(self.language, self.free_vars, self.depth - 1)
+                    for _ in range(self.language.get_max_function_arity())
+                )
+            else:
+                self._subterms = ()
+
+        return self._subterms
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = set()
+    @subterms.setter
+    def subterms(self, subterms: Tuple[TermTemplate, ...]) -> None:
+        self._subterms = subterms
 
-        for var in self.free_vars:
-            free_vars.update(self.substitution[var].get_free_variables())
+    def _clear_cache(self) -> None:
+        self._cached_free_variables: Optional[FrozenSet[Variable]] = None
+        self._cached_is_null_constraint: Optional[smt.SMTTerm] = None
+        self._cached_constraint: Optional[smt.SMTTerm] = None
+        self._cached_well_formedness_constraints: Dict[Sort, smt.SMTTerm] = {}
 
-        return free_vars
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        if self._cached_free_variables is None:
+            self._cached_free_variables = frozenset().union(*(term.get_free_variables() for term in self.free_var_terms))
+        return self._cached_free_variables
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> TermTemplate:
         # TODO: check sorting
-        new_template = TermTemplate(self.language, self.free_vars, self.depth, self.sort)
-        new_template.node = self.node
-        new_template.substitution = { k: v.substitute(substitution) for k, v in self.substitution.items() }
-        new_template.subterms = tuple(subterm.substitute(substitution) for subterm in self.subterms)
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
+
+        # the new template shares the control variables (and unaffected subterms) with self,
+        # so the subterms of self are built (if not already) before copying
+        subterms = tuple(subterm.substitute(substitution) for subterm in self.subterms)
+
+        new_template = copy.copy(self)
+        new_template._clear_cache()
+        new_template.free_var_terms = tuple(term.substitute(substitution) for term in self.free_var_terms)
+        new_template.subterms = subterms
         return new_template
 
     def get_constraint(self) -> smt.SMTTerm:
@@ -50,7 +81,9 @@ class TermTemplate(Term):
         The term can be of any sort
         """
         if self.sort is None:
-            return smt.Or(*(self.get_well_formedness_constraint(sort) for sort in self.language.sorts))
+            if self._cached_constraint is None:
+                self._cached_constraint = smt.Or(*(self.get_well_formedness_constraint(sort) for sort in self.language.sorts))
+            return self._cached_constraint
         else:
             return self.get_well_formedness_constraint(self.sort)
 
@@ -61,78 +94,82 @@ class TermTemplate(Term):
         node_value = self.node.get_from_smt_model(model)
         assert node_value != 0, f"unexpected node value {node_value}"
 
-        if node_value <= len(self.free_vars):
-            return self.substitution[self.free_vars[node_value - 1]].get_from_smt_model(model)
+        num_free_vars = len(self.free_vars)
+
+        if node_value <= num_free_vars:
+            return self.free_var_terms[node_value - 1].get_from_smt_model(model)
         else:
-            symbol = self.language.function_symbols[node_value - len(self.free_vars) - 1]
+            symbol = self.language.function_symbols[node_value - num_free_vars - 1]
             arity = len(symbol.input_sorts)
             return Application(symbol, tuple(subterm.get_from_smt_model(model) for subterm in self.subterms[:arity]))
 
     def equals(self, value: Term) -> smt.SMTTerm:
-        constraint = smt.FALSE()
-
-        for node_value in range(1, len(self.free_vars) + len(self.language.function_symbols) + 1):
-            if node_value <= len(self.free_vars):
-                variable = self.free_vars[node_value - 1]
-                constraint = smt.Or(smt.And(self.node.equals(node_value), self.substitution[variable].equals(value)), constraint)
-            elif isinstance(value, Application):
-                symbol = self.language.function_symbols[node_value - len(self.free_vars) - 1]
-                arity = len(symbol.input_sorts)
+        disjuncts: List[smt.SMTTerm] = []
 
-                if value.function_symbol == symbol and (self.depth != 0 or arity == 0):
-                    assert len(value.arguments) == arity
+        for node_value, term in enumerate(self.free_var_terms, 1):
+            disjuncts.append(smt.And(self.node.equals(node_value), term.equals(value)))
 
-                    constraint = smt.Or(
-                        smt.And(
-                            self.node.equals(node_value),
-                            *(subterm.equals(argument) for argument, subterm in zip(value.arguments, self.subterms[:arity])),
-                        ),
-                        constraint,
-                    )
+        if isinstance(value, Application):
+            arity = len(value.arguments)
 
-        return constraint
+            if self.depth != 0 or arity == 0:
+                # a symbol may occur more than once in the language
+                for symbol_index in self.language.get_function_symbol_indices(value.function_symbol):
+                    assert len(value.function_symbol.input_sorts) == arity
+                    disjuncts.append(smt.And(
+                        self.node.equals(len(self.free_vars) + 1 + symbol_index),
+                        *(subterm.equals(argument) for argument, subterm in zip(value.arguments, self.subterms[:arity])),
+                    ))
+
+        return smt.Or(*disjuncts)
 
     def get_is_null_constraint(self) -> smt.SMTTerm:
         """
         Return a constraint saying that the subtree starting at self does not exist
         """
-        return smt.And(self.node.equals(0), *(subterm.get_is_null_constraint() for subterm in self.subterms))
+        if self._cached_is_null_constraint is None:
+            self._cached_is_null_constraint = smt.And(self.node.equals(0), *(subterm.get_is_null_constraint() for subterm in self.subterms))
+        return self._cached_is_null_constraint
 
     def get_well_formedness_constraint(self, sort: Sort) -> smt.SMTTerm:
         """
         Return a constraint saying that the term is well-formed and has sort <sort> 
         """
-        constraint = smt.FALSE()
-
-        for node_value in range(1, len(self.free_vars) + len(self.language.function_symbols) + 1):
-            if node_value <= len(self.free_vars):
-                variable = self.free_vars[node_value - 1]
-
-                if variable.sort == sort:
-                    constraint = smt.Or(
-                        smt.And(
-                            self.node.equals(node_value),
-                            self.substitution[variable].get_constraint(),
-                            *(subterm.get_is_null_constraint() for subterm in self.subterms),
-                        ),
-                        constraint,
-                    )
-            else:
-                symbol = self.language.function_symbols[node_value - len(self.free_vars) - 1]
-                arity = len(symbol.input_sorts)
+        if sort in self._cached_well_formedness_constraints:
+            return self._cached_well_formedness_constraints[sort]
+
+        disjuncts: List[smt.SMTTerm] = []
+
+        for node_value, (variable, term) in enumerate(zip(self.free_vars, self.free_var_terms), 1):
+            if variable.sort == sort:
+                disjuncts.append(smt.And(
+                    self.node.equals(node_value),
+                    term.get_constraint(),
+                    *(subterm.get_is_null_constraint() for subterm in self.subterms),
+                ))
 
-                if symbol.output_sort == sort and (self.depth != 0 or arity == 0):
-                    constraint = smt.Or(
-                        smt.And(
-                            self.node.equals(node_value),
-                            # the i-th subterm should have the i-th input sort
-                            *(subterm.get_well_formedness_constraint(sort) for sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])),
-                            *(subterm.get_is_null_constraint() for subterm in self.subterms[arity:]),
-                        ),
-                        constraint,
-                    )
+        node_value_offset = len(self.free_vars) + 1
 
-        return smt.And(constraint, self.node.get_constraint())
+        # only constants are available at the leaves
+        if self.depth != 0:
+            symbols = self.language.get_function_symbols_of_output_sort(sort)
+        else:
+            symbols = self.language.get_nullary_function_symbols_of_output_sort(sort)
+
+        for symbol_index, symbol in symbols:
+            node_value = node_value_offset + symbol_index
+            arity = len(symbol.input_sorts)
+
+            disjuncts.append(smt.And(
+                self.node.equals(node_value),
+                # the i-th subterm should have the i-th input sort
+                *(subterm.get_well_formedness_constraint(sort) for sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])),
+                *(subterm.get_is_null_constraint() for subterm in self.subterms[arity:]),
+            ))
+
+        constraint = smt.And(smt.Or(*disjuncts), self.node.get_constraint())
+        self._cached_well_formedness_constraints[sort] = constraint
+        return constraint
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         assert self.sort is not None, \
@@ -147,21 +184,27 @@ class TermTemplate(Term):
         carrier = structure.interpret_sort(sort)
         interp = smt.FreshSymbol(carrier.get_smt_sort())
 
-        for node_value in range(1, len(self.free_vars) + len(self.language.function_symbols) + 1):
-            if node_value <= len(self.free_vars):
-                variable = self.free_vars[node_value - 1]
-                if variable.sort == sort:
-                    interp = smt.Ite(self.node.equals(node_value), self.substitution[variable].interpret(structure, valuation), interp)
-            else:
-                symbol = self.language.function_symbols[node_value - len(self.free_vars) - 1]
-                arity = len(symbol.input_sorts)
+        for node_value, (variable, term) in enumerate(zip(self.free_vars, self.free_var_terms), 1):
+            if variable.sort == sort:
+                interp = smt.Ite(self.node.equals(node_value), term.interpret(structure, valuation), interp)
 
-                if symbol.output_sort == sort and (self.depth != 0 or arity == 0):
-                    arguments = tuple(
-                        subterm.interpret_as_sort(subterm_sort, structure, valuation)
-                        for subterm_sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])
-                    )
-                    interp = smt.Ite(self.node.equals(node_value), structure.interpret_function(symbol, *arguments), interp)
+        node_value_offset = len(self.free_vars) + 1
+
+        # only constants are available at the leaves
+        if self.depth != 0:
+            symbols = self.language.get_function_symbols_of_output_sort(sort)
+        else:
+            symbols = self.language.get_nullary_function_symbols_of_output_sort(sort)
+
+        for symbol_index, symbol in symbols:
+            node_value = node_value_offset + symbol_index
+            arity = len(symbol.input_sorts)
+
+            arguments = tuple(
+                subterm.interpret_as_sort(subterm_sort, structure, valuation)
+                for subterm_sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])
+            )
+            interp = smt.Ite(self.node.equals(node_value), structure.interpret_function(symbol, *arguments), interp)
 
         return interp
 
@@ -172,16 +215,19 @@ class TermTemplate(Term):
 
         terms: OrderedDict[Sort, List[List[Term]]] = OrderedDict()
 
-        def add_term(sort: Sort, depth: int, term: Term) -> None:
+        def get_mutable_terms_at_depth(sort: Sort, depth: int) -> List[Term]:
             if sort not in terms:
                 terms[sort] = []
 
             if len(terms[sort]) <= depth:
                 terms[sort] += [ [] for _ in range(depth - len(terms[sort]) + 1) ]
 
-            terms[sort][depth].append(term)
+            return terms[sort][depth]
+
+        def add_term(sort: Sort, depth: int, term: Term) -> None:
+            get_mutable_terms_at_depth(sort, depth).append(term)
 
-        def get_terms_at_depth(sort: Sort, depth: int) -> Iterable[Term]:
+        def get_terms_at_depth(sort: Sort, depth: int) -> List[Term]:
             if sort not in terms:
                 return []
 
@@ -190,6 +236,19 @@ class TermTemplate(Term):
 
             return terms[sort][depth]
 
+        # memoized lists of terms of a sort with depth <= a given depth
+        # (only queried for depths that are already fully enumerated)
+        terms_up_to_depth: Dict[Tuple[Sort, int], List[Term]] = {}
+
+        def get_terms_up_to_depth(sort: Sort, depth: int) -> List[Term]:
+            if (sort, depth) not in terms_up_to_depth:
+                terms_up_to_depth[sort, depth] = [
+                    term
+                    for subterm_depth in range(depth + 1)
+                    for term in get_terms_at_depth(sort, subterm_depth)
+                ]
+            return terms_up_to_depth[sort, depth]
+
         for depth in range(self.depth + 1):
             if depth == 0:
                 for free_var in self.free_vars:
@@ -211,22 +270,31 @@ class TermTemplate(Term):
                     if arity == 0:
                         continue
 
-                    for subterm_depths in itertools.product(tuple(range(depth)), repeat=arity):
-                        # skip depth combinations that would result in a < depth formula
-                        if depth - 1 not in subterm_depths:
+                    bank = get_mutable_terms_at_depth(symbol.output_sort, depth)
+                    should_yield = self.sort is None or symbol.output_sort == self.sort
+
+                    # a term of the said depth has at least one argument of depth - 1;
+                    # split on the first such argument position so that each combination
+                    # of arguments is generated exactly once
+                    for first_deepest in range(arity):
+                        # no term has an argument of depth - 1 at this position
+                        if len(get_terms_at_depth(symbol.input_sorts[first_deepest], depth - 1)) == 0:
                             continue
 
                         # get possible candidates for each argument position
                         subterm_lists = [
-                            get_terms_at_depth(symbol.input_sorts[i], subterm_depth)
-                            for i, subterm_depth in enumerate(subterm_depths)
+                            get_terms_up_to_depth(input_sort, depth - 2) if i < first_deepest else
+                            get_terms_at_depth(input_sort, depth - 1) if i == first_deepest else
+                            get_terms_up_to_depth(input_sort, depth - 1)
+                            for i, input_sort in enumerate(symbol.input_sorts)
                         ]
 
-                        # now iterate through all formulas of the said depth
-                        for subterms in itertools.product(*subterm_lists):
-                            term = Application(symbol, subterms)
-                            add_term(symbol.output_sort, depth, term)
-                            if self.sort is None or symbol.output_sort == self.sort:
+                        # now build all terms of the said depth in one batch
+                        new_terms = [ Application(symbol, subterms) for subterms in itertools.product(*subterm_lists) ]
+                        bank.extend(new_terms)
+
+                        if should_yield:
+                            for term in new_terms:
                                 yield symbol.output_sort, term
 
 
@@ -242,17 +310,20 @@ class AtomicFormulaTemplate(Formula):
         self.node = BoundedIntegerVariable(0, 3 + len(language.relation_symbols))
 
         self.subterms = tuple(TermTemplate(language, free_vars, term_depth) for _ in range(language.get_max_relation_arity()))
+        self._clear_cache()
+
+    def _clear_cache(self) -> None:
+        self._cached_free_variables: Optional[FrozenSet[Variable]] = None
+        self._cached_is_null_constraint: Optional[smt.SMTTerm] = None
+        self._cached_well_formedness_constraint: Optional[smt.SMTTerm] = None
 
     def __str__(self) -> str:
         return f"<φ({', '.join(map(str, self.get_free_variables()))}), depth {self.term_depth}>"
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = set()
-
-        for subterm in self.subterms:
-            free_vars.update(subterm.get_free_variables())
-
-        return free_vars
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        if self._cached_free_variables is None:
+            self._cached_free_variables = frozenset().union(*(subterm.get_free_variables() for subterm in self.subterms))
+        return self._cached_free_variables
 
     def is_qfree(self) -> bool:
         return True
@@ -262,8 +333,11 @@ class AtomicFormulaTemplate(Formula):
         NOTE: the new formula's control variable is the same as the old one
         this may not be intended in some case
         """
-        new_formula = AtomicFormulaTemplate(self.language, (), self.term_depth, self.allow_constant)
-        new_formula.node = self.node
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
+
+        new_formula = copy.copy(self)
+        new_formula._clear_cache()
         new_formula.subterms = tuple(subterm.substitute(substitution) for subterm in self.subterms)
         return new_formula
 
@@ -295,10 +369,12 @@ class AtomicFormulaTemplate(Formula):
         elif isinstance(value, Verum):
             return self.node.equals(2)
 
-        elif isinstance(value, RelationApplication) and \
-             value.relation_symbol in self.language.relation_symbols:
+        elif isinstance(value, RelationApplication):
+            symbol_index = self.language.get_relation_symbol_index(value.relation_symbol)
+
+            if symbol_index is None:
+                return smt.FALSE()
 
-            symbol_index = self.language.relation_symbols.index(value.relation_symbol)
             arity = len(value.relation_symbol.input_sorts)
 
             return smt.And(
@@ -310,37 +386,38 @@ class AtomicFormulaTemplate(Formula):
             return smt.FALSE()
 
     def get_is_null_constraint(self) -> smt.SMTTerm:
-        return smt.And(
-            self.node.equals(0),
-            *(subterm.get_is_null_constraint() for subterm in self.subterms),
-        )
+        if self._cached_is_null_constraint is None:
+            self._cached_is_null_constraint = smt.And(
+                self.node.equals(0),
+                *(subterm.get_is_null_constraint() for subterm in self.subterms),
+            )
+        return self._cached_is_null_constraint
 
     def get_well_formedness_constraint(self) -> smt.SMTTerm:
-        constraint = smt.FALSE()
+        if self._cached_well_formedness_constraint is not None:
+            return self._cached_well_formedness_constraint
+
+        disjuncts: List[smt.SMTTerm] = []
 
         for node_value in range(1, 3 + len(self.language.relation_symbols)):
             if node_value == 1 or node_value == 2:
                 if self.allow_constant:
-                    constraint = smt.Or(
-                        smt.And(
-                            self.node.equals(node_value),
-                            *(subterm.get_is_null_constraint() for subterm in self.subterms),
-                        ),
-                        constraint,
-                    )
+                    disjuncts.append(smt.And(
+                        self.node.equals(node_value),
+                        *(subterm.get_is_null_constraint() for subterm in self.subterms),
+                    ))
             else:
                 symbol = self.language.relation_symbols[node_value - 3]
                 arity = len(symbol.input_sorts)
 
-                constraint = smt.Or(
-                    smt.And(
-                        self.node.equals(node_value),
-                        *(subterm.get_well_formedness_constraint(sort) for sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])),
-                        *(subterm.get_is_null_constraint() for subterm in self.subterms[arity:]),
-                    ),
-                    constraint,
-                )
+                disjuncts.append(smt.And(
+                    self.node.equals(node_value),
+                    *(subterm.get_well_formedness_constraint(sort) for sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])),
+                    *(subterm.get_is_null_constraint() for subterm in self.subterms[arity:]),
+                ))
 
+        constraint = smt.Or(*disjuncts)
+        self._cached_well_formedness_constraint = constraint
         return constraint
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
@@ -348,14 +425,12 @@ class AtomicFormulaTemplate(Formula):
         Interpret the undetermined atomic formula in the given structure and valuation
         """
 
-        interp = smt.FALSE()
-
-        for node_value in range(1, 3 + len(self.language.relation_symbols)):
-            if node_value == 1:
-                interp = smt.Ite(self.node.equals(node_value), smt.FALSE(), interp)
+        disjuncts: List[smt.SMTTerm] = []
 
-            elif node_value == 2:
-                interp = smt.Ite(self.node.equals(node_value), smt.TRUE(), interp)
+        for node_value in range(2, 3 + len(self.language.relation_symbols)):
+            # node value 1 (falsum) contributes no disjunct
+            if node_value == 2:
+                disjuncts.append(self.node.equals(node_value))
 
             else:
                 symbol = self.language.relation_symbols[node_value - 3]
@@ -364,9 +439,21 @@ class AtomicFormulaTemplate(Formula):
                     subterm.interpret_as_sort(sort, structure, valuation)
                     for sort, subterm in zip(symbol.input_sorts, self.subterms[:arity])
                 )
-                interp = smt.Ite(self.node.equals(node_value), structure.interpret_relation(symbol, *arguments), interp)
+                disjuncts.append(smt.And(self.node.equals(node_value), structure.interpret_relation(symbol, *arguments)))
+
+        return smt.Or(*disjuncts)
 
-        return interp
+
+# constructors and arities for node values of QuantifierFreeFormulaTemplate
+# 0 for null
+# 1 for leaf
+_QUANTIFIER_FREE_CONSTRUCTORS: Dict[int, Tuple[Callable[..., Formula], int]] = {
+    2: (Conjunction, 2),
+    3: (Disjunction, 2),
+    4: (Negation, 1),
+    5: (Implication, 2),
+    6: (Equivalence, 2),
+}
 
 
 class QuantifierFreeFormulaTemplate(Formula):
@@ -390,69 +477,69 @@ class QuantifierFreeFormulaTemplate(Formula):
                 QuantifierFreeFormulaTemplate(language, free_vars, term_depth, formula_depth - 1),
             )
 
-    def get_constructor_and_arity(self, node_value: int) -> Tuple[Callable[..., Formula], int]:
-        return {
-            # 0 for null
-            # 1 for leaf
-            2: (Conjunction, 2),
-            3: (Disjunction, 2),
-            4: (Negation, 1),
-            5: (Implication, 2),
-            6: (Equivalence, 2),
-        }[node_value]
+        # node values of non-null formulas: 1 for the atom, 2-6 for connectives (if any)
+        self._node_values: Tuple[int, ...] = (1,) if formula_depth == 0 else tuple(range(1, self.node.upper + 1))
+
+        self._clear_cache()
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = self.atom.get_free_variables()
+    def _clear_cache(self) -> None:
+        self._cached_free_variables: Optional[FrozenSet[Variable]] = None
+        self._cached_is_null_constraint: Optional[smt.SMTTerm] = None
 
-        for subformula in self.subformulas:
-            free_vars.update(subformula.get_free_variables())
+    def get_constructor_and_arity(self, node_value: int) -> Tuple[Callable[..., Formula], int]:
+        return _QUANTIFIER_FREE_CONSTRUCTORS[node_value]
 
-        return free_vars
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        if self._cached_free_variables is None:
+            self._cached_free_variables = frozenset().union(
+                self.atom.get_free_variables(),
+                *(subformula.get_free_variables() for subformula in self.subformulas),
+            )
+        return self._cached_free_variables
 
     def is_qfree(self) -> bool:
         return True
 
     def substitute(self, substitution: Mapping[Variable, Term]) -> QuantifierFreeFormulaTemplate:
-        new_formula = QuantifierFreeFormulaTemplate(self.language, (), self.term_depth, self.formula_depth)
-        new_formula.node = self.node
+        if substitution.keys().isdisjoint(self.get_free_variables()):
+            return self
+
+        new_formula = copy.copy(self)
+        new_formula._clear_cache()
         new_formula.atom = self.atom.substitute(substitution)
         new_formula.subformulas = tuple(subformula.substitute(substitution) for subformula in self.subformulas)
         return new_formula
 
     def get_is_null_constraint(self) -> smt.SMTTerm:
-        return smt.And(
-            self.node.equals(0),
-            self.atom.get_is_null_constraint(),
-            *(subformula.get_is_null_constraint() for subformula in self.subformulas),
-        )
+        if self._cached_is_null_constraint is None:
+            self._cached_is_null_constraint = smt.And(
+                self.node.equals(0),
+                self.atom.get_is_null_constraint(),
+                *(subformula.get_is_null_constraint() for subformula in self.subformulas),
+            )
+        return self._cached_is_null_constraint
 
     def get_constraint(self) -> smt.SMTTerm:
-        constraint = smt.FALSE()
+        disjuncts: List[smt.SMTTerm] = []
 
-        for node_value in self.node.get_range():
+        for node_value in self._node_values:
             if node_value == 1:
-                constraint = smt.Or(
-                    smt.And(
-                        self.node.equals(node_value),
-                        self.atom.get_constraint(),
-                        *(subformula.get_is_null_constraint() for subformula in self.subformulas),
-                    ),
-                    constraint,
-                )
+                disjuncts.append(smt.And(
+                    self.node.equals(node_value),
+                    self.atom.get_constraint(),
+                    *(subformula.get_is_null_constraint() for subformula in self.subformulas),
+                ))
             
-            elif node_value != 0 and self.formula_depth != 0:
+            else:
                 _, arity = self.get_constructor_and_arity(node_value)
-                constraint = smt.Or(
-                    smt.And(
-                        self.node.equals(node_value),
-                        self.atom.get_is_null_constraint(),
-                        *(subformula.get_constraint() for subformula in self.subformulas[:arity]),
-                        *(subformula.get_is_null_constraint() for subformula in self.subformulas[arity:]),
-                    ),
-                    constraint,
-                )
+                disjuncts.append(smt.And(
+                    self.node.equals(node_value),
+                    self.atom.get_is_null_constraint(),
+                    *(subformula.get_constraint() for subformula in self.subformulas[:arity]),
+                    *(subformula.get_is_null_constraint() for subformula in self.subformulas[arity:]),
+                ))
 
-        return constraint
+        return smt.Or(*disjuncts)
 
     def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
         node_value = self.node.get_from_smt_model(model)
@@ -515,113 +602,78 @@ class QuantifierFreeFormulaTemplate(Formula):
             return smt.FALSE()
 
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        interp = smt.FALSE()
+        disjuncts: List[smt.SMTTerm] = []
 
-        for node_value in self.node.get_range():
-            if node_value == 1:
-                interp = smt.Ite(
-                    self.node.equals(node_value),
-                    self.atom.interpret(structure, valuation),
-                    interp,
-                )
+        # each subformula is interpreted once and shared by all connectives
+        subformula_interps = tuple(subformula.interpret(structure, valuation) for subformula in self.subformulas)
 
-            elif self.formula_depth != 0:
-                if node_value == 2:
-                    interp = smt.Ite(
-                        self.node.equals(node_value),
-                        smt.And(
-                            self.subformulas[0].interpret(structure, valuation),
-                            self.subformulas[1].interpret(structure, valuation),
-                        ),
-                        interp,
-                    )
-
-                elif node_value == 3:
-                    interp = smt.Ite(
-                        self.node.equals(node_value),
-                        smt.Or(
-                            self.subformulas[0].interpret(structure, valuation),
-                            self.subformulas[1].interpret(structure, valuation),
-                        ),
-                        interp,
-                    )
-
-                elif node_value == 4:
-                    interp = smt.Ite(
-                        self.node.equals(node_value),
-                        smt.Not(self.subformulas[0].interpret(structure, valuation)),
-                        interp,
-                    )
+        for node_value in self._node_values:
+            if node_value == 1:
+                interp = self.atom.interpret(structure, valuation)
 
-                elif node_value == 5:
-                    interp = smt.Ite(
-                        self.node.equals(node_value),
-                        smt.Implies(
-                            self.subformulas[0].interpret(structure, valuation),
-                            self.subformulas[1].interpret(structure, valuation),
-                        ),
-                        interp,
-                    )
-
-                elif node_value == 6:
-                    interp = smt.Ite(
-                        self.node.equals(node_value),
-                        smt.Iff(
-                            self.subformulas[0].interpret(structure, valuation),
-                            self.subformulas[1].interpret(structure, valuation),
-                        ),
-                        interp,
-                    )
+            elif node_value == 2:
+                interp = smt.And(subformula_interps[0], subformula_interps[1])
 
-        return interp
+            elif node_value == 3:
+                interp = smt.Or(subformula_interps[0], subformula_interps[1])
 
+            elif node_value == 4:
+                interp = smt.Not(subformula_interps[0])
 
-class UnionFormulaTemplate(UnionTemplate[Formula], Formula):
-    templates: Tuple[Formula, ...]
+            elif node_value == 5:
+                interp = smt.Implies(subformula_interps[0], subformula_interps[1])
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = set()
+            elif node_value == 6:
+                interp = smt.Iff(subformula_interps[0], subformula_interps[1])
 
-        for template in self.templates:
-            free_vars.update(template.get_free_variables())
+            disjuncts.append(smt.And(self.node.equals(node_value), interp))
 
-        return free_vars
+        return smt.Or(*disjuncts)
 
-    def substitute(self, substitution: Mapping[Variable, Term]) -> UnionFormulaTemplate:
-        return type(self)(*(template.substitute(substitution) for template in self.templates))
 
-    def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
-        return smt.Or(*(
-            smt.Ite(
-                self.node.equals(node_value),
-                template.interpret(structure, valuation),
-                smt.FALSE(),
-            )
-            for node_value, template in enumerate(self.templates, 1)
-        ))
+_U = TypeVar("_U", Term, Formula)
+_UnionTemplateSelf = TypeVar("_UnionTemplateSelf", bound="_UnionTemplateMixin")
 
 
-class UnionTermTemplate(UnionTemplate[Term], Term):
-    # TODO: exactly the same code as UnionFormulaTemplate
-    templates: Tuple[Term, ...]
+class _UnionTemplateMixin(Generic[_U]):
+    """
+    Code shared by UnionFormulaTemplate and UnionTermTemplate
+    """
 
-    def get_free_variables(self) -> Set[Variable]:
-        free_vars = set()
+    templates: Tuple[_U, ...]
 
-        for template in self.templates:
-            free_vars.update(template.get_free_variables())
+    def __init__(self, *templates: _U):
+        super().__init__(*templates)
+        self._cached_free_variables: Optional[FrozenSet[Variable]] = None
 
-        return free_vars
+    def get_free_variables(self) -> FrozenSet[Variable]:
+        if self._cached_free_variables is None:
+            self._cached_free_variables = frozenset().union(*(template.get_free_variables() for template in self.templates))
+        return self._cached_free_variables
 
-    def substitute(self, substitution: Mapping[Variable, Term]) -> UnionTermTemplate:
+    def substitute(self: _UnionTemplateSelf, substitution: Mapping[Variable, Term]) -> _UnionTemplateSelf:
         return type(self)(*(template.substitute(substitution) for template in self.templates))
 
+
+class UnionFormulaTemplate(_UnionTemplateMixin[Formula], UnionTemplate[Formula], Formula):
+    templates: Tuple[Formula, ...]
+
     def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
         return smt.Or(*(
-            smt.Ite(
-                self.node.equals(node_value),
-                template.interpret(structure, valuation),
-                smt.FALSE(),
-            )
+            smt.And(self.node.equals(node_value), template.interpret(structure, valuation))
             for node_value, template in enumerate(self.templates, 1)
         ))
+
+
+class UnionTermTemplate(_UnionTemplateMixin[Term], UnionTemplate[Term], Term):
+    templates: Tuple[Term, ...]
+
+    def interpret(self, structure: Structure, valuation: Mapping[Variable, smt.SMTTerm]) -> smt.SMTTerm:
+        # terms are not necessarily boolean, so the branches are selected with Ite
+        # (the last branch is the default since the node is in range by get_constraint)
+        interp = self.templates[-1].interpret(structure, valuation)
+
+        for node_value in range(len(self.templates) - 1, 0, -1):
+            interp = smt.Ite(self.node.equals(node_value), self.templates[node_value - 1].interpret(structure, valuation), interp)
+
+        return interp
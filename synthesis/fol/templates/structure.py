@@ -1,4 +1,4 @@
-from typing import Mapping, Dict, Optional, List
+from typing import Mapping, Dict, Optional, List, Iterable, Union
 from collections import OrderedDict
 
 import itertools
@@ -92,12 +92,7 @@ class FOModelTemplate(UninterpretedStructureTemplate):
         """
         The model should satify all sentences in the theory
         """
-        constraint = smt.TRUE()
-
-        for formula in self.theory.convert_to_fo_theory():
-            constraint = smt.And(formula.interpret(self, {}), constraint)
-
-        return constraint
+        return smt.And(*(formula.interpret(self, {}) for formula in self.theory.convert_to_fo_theory()))
 
 
 class FiniteFOModelTemplate(UninterpretedStructureTemplate):
@@ -127,7 +122,7 @@ class FiniteFOModelTemplate(UninterpretedStructureTemplate):
         """
         The model should satify all sentences in the theory
         """
-        constraint = smt.TRUE()
+        constraints: List[smt.SMTTerm] = []
 
         # all functions are closed
         for function_symbol in self.theory.language.function_symbols:
@@ -146,12 +141,12 @@ class FiniteFOModelTemplate(UninterpretedStructureTemplate):
                     carrier = self.interpret_sort(sort)
                     closed_constraint = carrier.universally_quantify(var, closed_constraint)
 
-                constraint = smt.And(closed_constraint, constraint)
+                constraints.append(closed_constraint)
 
         for formula in self.theory.convert_to_fo_theory():
-            constraint = smt.And(formula.interpret(self, {}), constraint)
+            constraints.append(formula.interpret(self, {}))
 
-        return constraint
+        return smt.And(*constraints)
 
     def get_from_smt_model(self, model: smt.SMTModel) -> SymbolicStructure:
         """
@@ -191,6 +186,57 @@ class FiniteFOModelTemplate(UninterpretedStructureTemplate):
 
         return SymbolicStructure(self.theory.language, concrete_carriers, concrete_functions, concrete_relations)
 
+    def get_diagram_constraint(
+        self,
+        model: smt.SMTModel,
+        symbols: Optional[Iterable[Union[FunctionSymbol, RelationSymbol]]] = None,
+    ) -> smt.SMTTerm:
+        """
+        A constraint saying that the equalities between domain elements and the interpretations
+        of all uninterpreted functions/relations on the domain are the same as in the given model,
+        i.e. the negation of it blocks the concrete structure given by the model
+
+        If symbols is given, only the functions/relations in it are constrained
+        (the equalities between domain elements are always included)
+
+        Functions/relations involving non-finite sorts are not constrained
+        """
+        symbol_set = None if symbols is None else set(symbols)
+        literals: List[smt.SMTTerm] = []
+
+        def add_literal(term: smt.SMTTerm) -> None:
+            literals.append(term if model.get_value(term).is_true() else smt.Not(term))
+
+        for sort in self.theory.language.sorts:
+            if sort.smt_hook is None:
+                carrier = self.interpret_sort(sort)
+                assert isinstance(carrier, FiniteCarrierSet)
+
+                for left, right in itertools.combinations(carrier.domain, 2):
+                    add_literal(smt.Equals(left, right))
+
+        for function_symbol in self.theory.language.function_symbols:
+            if (symbol_set is None or function_symbol in symbol_set) and \
+               function_symbol.smt_hook is None and \
+               all(sort.smt_hook is None for sort in function_symbol.input_sorts + (function_symbol.output_sort,)):
+                output_carrier = self.interpret_sort(function_symbol.output_sort)
+                assert isinstance(output_carrier, FiniteCarrierSet)
+
+                for arguments in itertools.product(*self.get_domain_of_sorts(function_symbol.input_sorts)):
+                    output = self.interpret_function(function_symbol, *arguments)
+
+                    for element in output_carrier.domain:
+                        add_literal(smt.Equals(output, element))
+
+        for relation_symbol in self.theory.language.relation_symbols:
+            if (symbol_set is None or relation_symbol in symbol_set) and \
+               relation_symbol.smt_hook is None and \
+               all(sort.smt_hook is None for sort in relation_symbol.input_sorts):
+                for arguments in itertools.product(*self.get_domain_of_sorts(relation_symbol.input_sorts)):
+                    add_literal(self.interpret_relation(relation_symbol, *arguments))
+
+        return smt.And(*literals)
+
 
 class FiniteLFPModelTemplate(FiniteFOModelTemplate):
     """
@@ -312,12 +358,10 @@ class FiniteLFPModelTemplate(FiniteFOModelTemplate):
         """
         The model should satify all sentences in the theory
         """
-        constraint = super().get_constraint()
-
-        for definition in self.theory.get_fixpoint_definitions():
-            constraint = smt.And(self.get_constraints_for_least_fixpoint(definition), constraint)
-
-        return constraint
+        return smt.And(
+            super().get_constraint(),
+            *(self.get_constraints_for_least_fixpoint(definition) for definition in self.theory.get_fixpoint_definitions()),
+        )
 
     def get_constraints_for_least_fixpoint(self, definition: FixpointDefinition) -> smt.SMTTerm:
         """
@@ -403,11 +447,7 @@ class FOProvableStructureTemplate(UninterpretedStructureTemplate):
     def get_constraint(self) -> smt.SMTTerm:
         # NOTE: fixpoint axioms are not included here
 
-        constraint = smt.TRUE()
-        for axiom in self.theory.get_axioms():
-            constraint = smt.And(axiom.formula.interpret(self, {}), constraint)
-        
-        return constraint
+        return smt.And(*(axiom.formula.interpret(self, {}) for axiom in self.theory.get_axioms()))
 
     def interpret_fixpoint_definition(self, definition: FixpointDefinition) -> smt.SMTFunction:
         """
@@ -2,7 +2,7 @@ from typing import Mapping, Dict, List, Set, Iterable, Generator, Optional, Text
 
 import sys
 from enum import Enum
-from contextlib import nullcontext
+from contextlib import nullcontext, ExitStack
 
 import synthesis.fol as fol
 from synthesis.smt import smt
@@ -41,13 +41,17 @@ class ModalSynthesizer:
         self.solver_seed = solver_seed
         self.output = output
 
+        # free valuations of atoms on finite structures used by interpret_validity
+        # indexed by the id of the structure (a reference to the structure is kept)
+        self.free_valuations: Dict[int, Tuple[fol.SymbolicStructure, Dict[Atom, Tuple[smt.SMTFunction, Tuple[smt.SMTVariable, ...]]]]] = {}
+
     @staticmethod
     def get_atom_interpretation_in_structure(
         structure: fol.Structure,
         atom_symbols: Mapping[Atom, fol.RelationSymbol]
     ) -> Dict[Atom, smt.SMTFunction]:
         return {
-            atom: (lambda symbol: lambda world: structure.interpret_relation(symbol, world))(symbol)
+            atom: structure.get_relation_interpretation(symbol)
             for atom, symbol in atom_symbols.items()
         }
     
@@ -65,12 +69,22 @@ class ModalSynthesizer:
     def interpret_validity(self, formula: Formula, finite_structure: fol.SymbolicStructure) -> smt.SMTTerm:
         """
         Same as interpret_on_fo_structure but quantifies over all valuations
+
+        The free relation (and its variables) for each atom is created once per structure,
+        so that all constraints on the same structure use the same bound variables
         """
         all_variables: List[smt.SMTTerm] = []
         valuation: Dict[Atom, smt.SMTFunction] = {}
 
+        if id(finite_structure) not in self.free_valuations:
+            self.free_valuations[id(finite_structure)] = finite_structure, {}
+        free_valuation = self.free_valuations[id(finite_structure)][1]
+
         for atom in formula.get_atoms():
-            relation, variables = finite_structure.get_free_finite_relation((self.sort_world,))
+            if atom not in free_valuation:
+                free_valuation[atom] = finite_structure.get_free_finite_relation((self.sort_world,))
+
+            relation, variables = free_valuation[atom]
             valuation[atom] = relation
             all_variables.extend(variables)
 
@@ -162,11 +176,10 @@ class ModalSynthesizer:
 
             carrier_world = complement_model.interpret_sort(self.sort_world)
             skolemized_constants: List[smt.SMTTerm] = []
-            complement_constraint = smt.FALSE()
+            negated_axioms: List[smt.SMTTerm] = []
 
-            # negate each axiom and skolemize
-            for axiom in goal_theory.get_axioms():
-                formula = axiom.formula
+            # negate each (distinct) axiom and skolemize
+            for formula in self.get_distinct_axiom_formulas(goal_theory):
                 assignment: Dict[fol.Variable, smt.SMTTerm] = {}
 
                 while isinstance(formula, fol.UniversalQuantification) and \
@@ -176,12 +189,9 @@ class ModalSynthesizer:
                     assignment[formula.variable] = constant
                     formula = formula.body
 
-                complement_constraint = smt.Or(
-                    complement_constraint,
-                    smt.Not(formula.interpret(complement_model, assignment)),
-                )
+                negated_axioms.append(smt.Not(formula.interpret(complement_model, assignment)))
 
-            solver.add_assertion(complement_constraint)
+            solver.add_assertion(smt.Or(*negated_axioms))
 
             partition = self.construct_blobs(complement_model, skolemized_constants, blob_depth)
 
@@ -235,13 +245,26 @@ class ModalSynthesizer:
             #     print(" ... ✓", file=self.output)
             #     return True
 
+    @staticmethod
+    def get_distinct_axiom_formulas(theory: fol.Theory) -> Tuple[fol.Formula, ...]:
+        formulas: List[fol.Formula] = []
+
+        for axiom in theory.get_axioms():
+            if axiom.formula not in formulas:
+                formulas.append(axiom.formula)
+
+        return tuple(formulas)
+
     def complement_theory(self, theory: fol.Theory) -> fol.Theory:
         assert len(list(theory.get_fixpoint_definitions())) == 0
         return fol.Theory(
             theory.language,
             {},
             (
-                fol.Axiom(fol.Disjunction.from_disjuncts(*(fol.Negation(axiom.formula) for axiom in theory.get_axioms()))),
+                fol.Axiom(fol.Disjunction.from_disjuncts(*(
+                    fol.Negation(formula)
+                    for formula in self.get_distinct_axiom_formulas(theory)
+                ))),
             ),
         )
 
@@ -267,15 +290,60 @@ class ModalSynthesizer:
             ))
 
             goal_model = fol.FOModelTemplate(extended_theory)
-
             solver.add_assertion(goal_model.get_constraint())
-            solver.add_assertion(smt.Not(self.interpret_on_fo_structure(axiom, goal_model, atom_interpretatins)))
+
+            return self.check_validity_in_model(solver, goal_model, axiom, atom_interpretatins)
+
+    def check_validity_in_model(
+        self,
+        solver: smt.SMTSolver,
+        model: fol.Structure,
+        axiom: Formula,
+        atom_symbols: Mapping[Atom, fol.RelationSymbol],
+    ) -> bool:
+        """
+        Check if the given modal formula is valid in all models already constrained
+        in the solver. The query is added in a new scope, so the same solver can be
+        reused for multiple checks
+        """
+        with smt.push_solver(solver):
+            solver.add_assertion(smt.Not(self.interpret_on_fo_structure(axiom, model, atom_symbols)))
 
             try:
                 return not solver.solve()
             except:
                 return False
 
+    def get_counterexample_models(
+        self,
+        solver: smt.SMTSolver,
+        model: fol.FiniteFOModelTemplate,
+        trigger: smt.SMTTerm,
+        max_count: int,
+    ) -> List[smt.SMTModel]:
+        """
+        Get at most max_count models from the solver under the assumption trigger,
+        such that the frames (i.e. the transition relation on the worlds of the model
+        template) in the models are distinct
+
+        Each frame found is blocked under the same assumption
+        """
+        models: List[smt.SMTModel] = []
+
+        while len(models) < max_count and solver.solve([ trigger ]):
+            smt_model = solver.get_model()
+            models.append(smt_model)
+
+            if len(models) < max_count:
+                # block the current frame (but not the valuation of atoms)
+                # to get a model on a different frame
+                solver.add_assertion(smt.Implies(
+                    trigger,
+                    smt.Not(model.get_diagram_constraint(smt_model, symbols=(self.transition_symbol,))),
+                ))
+
+        return models
+
     def get_trivial_theory(self) -> fol.Theory:
         language = fol.Language(
             sorts=(self.sort_world,),
@@ -335,8 +403,12 @@ class ModalSynthesizer:
         check_soundness: bool = False,
         separate_independence: bool = False, # NOTE: this set to true will disable use_negative_examples
         use_enumeration: bool = False, # replace solver_synthesis with enumeration
+        synthesis_rebuild_interval: int = 0, # rebuild the scope of solver_synthesis every n queries (0 for never)
+        counterexamples_per_query: int = 1, # max number of (distinct) positive examples to get from each counterexample query
         stopwatch: Optional[Stopwatch] = None,
     ) -> Generator[Tuple[Formula, FormulaResultType], None, None]:
+        self.free_valuations.clear()
+
         # get all atoms used
         atoms: Set[Atom] = set()
         for template in formula_templates:
@@ -361,6 +433,12 @@ class ModalSynthesizer:
         trivial_model = fol.FiniteFOModelTemplate(trivial_theory, { self.sort_world: model_size_bound })
         goal_model = fol.FiniteFOModelTemplate(goal_theory, { self.sort_world: model_size_bound })
 
+        # the frames and atom valuations on the two model templates are fixed across iterations
+        trivial_frame = FOStructureFrame(trivial_model, self.sort_world, self.transition_symbol)
+        trivial_valuation = self.get_atom_interpretation_in_structure(trivial_model, atom_symbols)
+        goal_frame = FOStructureFrame(goal_model, self.sort_world, self.transition_symbol)
+        goal_valuation = self.get_atom_interpretation_in_structure(goal_model, atom_symbols)
+
         # These lists persist across synthesis of different templates
         positive_examples: List[fol.SymbolicStructure] = []
         negative_examples: List[fol.SymbolicStructure] = []
@@ -369,7 +447,8 @@ class ModalSynthesizer:
 
         with smt.Solver(name="z3", random_seed=self.solver_seed) as solver_synthesis, \
              smt.Solver(name="z3", random_seed=self.solver_seed) as solver_independence, \
-             smt.Solver(name="z3", random_seed=self.solver_seed) as solver_counterexample:
+             smt.Solver(name="z3", random_seed=self.solver_seed) as solver_counterexample, \
+             ExitStack() as solver_stack:
 
             with stopwatch.time("encoding"):
                 if separate_independence:
@@ -378,8 +457,24 @@ class ModalSynthesizer:
                     solver_synthesis.add_assertion(trivial_model.get_constraint())
 
                 solver_counterexample.add_assertion(goal_model.get_constraint())
+
+                if check_soundness:
+                    # models of the goal theory without a size bound, shared by all soundness checks
+                    solver_soundness = solver_stack.enter_context(smt.Solver(name="z3", random_seed=self.solver_seed))
+                    unbounded_goal_model = fol.FOModelTemplate(goal_theory)
+                    solver_soundness.add_assertion(unbounded_goal_model.get_constraint())
             
+            # assertions of solver_synthesis in the scope of the current template
+            synthesis_assertions: List[smt.SMTTerm] = []
+
+            def add_synthesis_assertion(assertion: smt.SMTTerm) -> None:
+                solver_synthesis.add_assertion(assertion)
+                synthesis_assertions.append(assertion)
+
             for formula_template in formula_templates:
+                synthesis_assertions.clear()
+                synthesis_query_count = 0
+
                 new_positive_examples = positive_examples
                 new_negative_examples = negative_examples
                 new_true_formulas = true_formulas
@@ -392,12 +487,12 @@ class ModalSynthesizer:
 
                 with (smt.push_solver(solver_synthesis) if not use_enumeration else nullcontext()):
                     with stopwatch.time("encoding"):
-                        solver_synthesis.add_assertion(formula_template.get_constraint())
+                        add_synthesis_assertion(formula_template.get_constraint())
 
                         # state that the formula should not hold on frames where
                         # true_formulas hold (initially true_formulas = [] so all frames)
                         if not separate_independence:
-                            solver_synthesis.add_assertion(smt.Not(self.interpret_on_fo_structure(formula_template, trivial_model, atom_symbols)))
+                            add_synthesis_assertion(smt.Not(formula_template.interpret_on_all_worlds(trivial_frame, trivial_valuation)))
 
                     while True:
                         if not use_positive_examples:
@@ -411,14 +506,14 @@ class ModalSynthesizer:
                             with stopwatch.time("encoding"):
                                 for positive_example in new_positive_examples:
                                     # solver_synthesis.add_assertion(self.interpret_on_fo_structure(formula_template, positive_example, atom_symbols))
-                                    solver_synthesis.add_assertion(self.interpret_validity(formula_template, positive_example))
+                                    add_synthesis_assertion(self.interpret_validity(formula_template, positive_example))
                         new_positive_examples = []
 
                         # add all negative examples
                         if not use_enumeration:
                             with stopwatch.time("encoding"):
                                 for negative_example in new_negative_examples:
-                                    solver_synthesis.add_assertion(smt.Not(self.interpret_validity(formula_template, negative_example)))
+                                    add_synthesis_assertion(smt.Not(self.interpret_validity(formula_template, negative_example)))
                         new_negative_examples = []
                         
                         # add all true formulas
@@ -428,14 +523,14 @@ class ModalSynthesizer:
                                     solver_independence.add_assertion(self.interpret_validity(formula, trivial_model))
                                 else:
                                     if not use_enumeration:
-                                        solver_synthesis.add_assertion(self.interpret_validity(formula, trivial_model))
+                                        add_synthesis_assertion(self.interpret_validity(formula, trivial_model))
                         new_true_formulas = []
 
                         # add all excluded formulas
                         if not use_enumeration:
                             with stopwatch.time("encoding"):
                                 for formula in new_excluded_formulas:
-                                    solver_synthesis.add_assertion(smt.Not(formula_template.equals(formula)))
+                                    add_synthesis_assertion(smt.Not(formula_template.equals(formula)))
                         new_excluded_formulas = []
 
                         if use_enumeration:
@@ -473,6 +568,15 @@ class ModalSynthesizer:
                                 break
                         else:
                             with stopwatch.time("synthesis"):
+                                synthesis_query_count += 1
+
+                                if synthesis_rebuild_interval > 0 and synthesis_query_count % synthesis_rebuild_interval == 0:
+                                    # replace the scope of the current template by a single assertion
+                                    # to drop the assertion stack and lemmas accumulated so far
+                                    solver_synthesis.pop()
+                                    solver_synthesis.push()
+                                    solver_synthesis.add_assertion(smt.And(*synthesis_assertions))
+
                                 if not solver_synthesis.solve():
                                     break
                                 smt_model = solver_synthesis.get_model()
@@ -495,7 +599,7 @@ class ModalSynthesizer:
                             # does not hold
                             with smt.push_solver(solver_independence, clear_formula_manager=use_enumeration):
                                 with stopwatch.time("encoding"):
-                                    solver_independence.add_assertion(smt.Not(self.interpret_on_fo_structure(candidate, trivial_model, atom_symbols)))
+                                    solver_independence.add_assertion(smt.Not(candidate.interpret_on_all_worlds(trivial_frame, trivial_valuation)))
 
                                 with stopwatch.time("independence"):
                                     solver_result = solver_independence.solve()
@@ -510,22 +614,38 @@ class ModalSynthesizer:
                                     yield candidate, FormulaResultType.DEPENDENT
                                     continue
 
-                        with smt.push_solver(solver_counterexample, clear_formula_manager=use_enumeration):
+                        # NOTE: push/pop is only needed for clearing the formula manager when enumerating
+                        with (smt.push_solver(solver_counterexample, clear_formula_manager=True) if use_enumeration else nullcontext()):
                             # try to find a frame in which the candidate does not hold on all worlds
+                            # the query is guarded by a fresh assumption literal instead of a push/pop
+                            # scope, so that the solver does not need to backtrack its assertion stack
                             with stopwatch.time("encoding"):
-                                solver_counterexample.add_assertion(smt.Not(self.interpret_on_fo_structure(candidate, goal_model, atom_symbols)))
+                                trigger = smt.FreshSymbol(smt.BOOL)
+                                solver_counterexample.add_assertion(smt.Implies(
+                                    trigger,
+                                    smt.Not(candidate.interpret_on_all_worlds(goal_frame, goal_valuation)),
+                                ))
 
                             with stopwatch.time("counterexample"):
-                                solver_result = solver_counterexample.solve()
+                                counterexample_models = self.get_counterexample_models(
+                                    solver_counterexample,
+                                    goal_model,
+                                    trigger,
+                                    counterexamples_per_query if use_positive_examples else 1,
+                                )
+
+                            # permanently disable the query
+                            solver_counterexample.add_assertion(smt.Not(trigger))
 
-                            if solver_result:
+                            if len(counterexample_models) != 0:
                                 print(" ... ✘ (counterexample)", file=self.output)
 
                                 if use_positive_examples:
-                                    # add the positive_example
-                                    positive_example = goal_model.get_from_smt_model(solver_counterexample.get_model())
-                                    positive_examples.append(positive_example)
-                                    new_positive_examples.append(positive_example)
+                                    # add the positive_examples
+                                    for counterexample_model in counterexample_models:
+                                        positive_example = goal_model.get_from_smt_model(counterexample_model)
+                                        positive_examples.append(positive_example)
+                                        new_positive_examples.append(positive_example)
                                 elif not use_enumeration:
                                     excluded_formulas.append(candidate)
                                     new_excluded_formulas.append(candidate)
@@ -534,7 +654,7 @@ class ModalSynthesizer:
                             else:
                                 if check_soundness:
                                     with stopwatch.time("soundness"):
-                                        sound = self.check_validity(goal_theory, candidate)
+                                        sound = self.check_validity_in_model(solver_soundness, unbounded_goal_model, candidate, atom_symbols)
                                     
                                     if not sound:
                                         print(" ... ✘ (unsound)", file=self.output)
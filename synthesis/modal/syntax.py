@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Mapping, Set, Tuple
+from typing import Mapping, Set, Tuple, List, ClassVar
 from dataclasses import dataclass
 from abc import ABC, abstractmethod, abstractstaticmethod
 
@@ -33,6 +33,14 @@ class Formula(Template["Formula"], ABC):
 
 @dataclass(frozen=True)
 class Falsum(Formula):
+    _instance: ClassVar[Falsum]
+
+    def __new__(cls) -> Falsum:
+        # there is only one falsum
+        if "_instance" not in cls.__dict__:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
     def __str__(self) -> str:
         return "⊥"
 
@@ -54,6 +62,14 @@ class Falsum(Formula):
 
 @dataclass(frozen=True)
 class Verum(Formula):
+    _instance: ClassVar[Verum]
+
+    def __new__(cls) -> Verum:
+        # there is only one verum
+        if "_instance" not in cls.__dict__:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
     def __str__(self) -> str:
         return "⊤"
 
@@ -104,11 +120,27 @@ class Conjunction(Formula):
     def __str__(self) -> str:
         return f"({self.left} ∧ {self.right})"
 
+    def get_conjuncts(self) -> Tuple[Formula, ...]:
+        """
+        Flatten nested conjunctions into a tuple of conjuncts (from left to right)
+        """
+        conjuncts: List[Formula] = []
+        stack: List[Formula] = [self]
+
+        while len(stack) != 0:
+            formula = stack.pop()
+
+            if isinstance(formula, Conjunction):
+                stack.append(formula.right)
+                stack.append(formula.left)
+            else:
+                conjuncts.append(formula)
+
+        return tuple(conjuncts)
+
     def interpret(self, frame: Frame, valuation: Mapping[Atom, smt.SMTFunction], world: smt.SMTTerm) -> smt.SMTTerm:
-        return smt.And(
-            self.left.interpret(frame, valuation, world),
-            self.right.interpret(frame, valuation, world),
-        )
+        # interpret a chain of conjunctions (e.g. an axiomatization) as a single n-ary SMT conjunction
+        return smt.And(*(conjunct.interpret(frame, valuation, world) for conjunct in self.get_conjuncts()))
 
     def get_constraint(self) -> smt.SMTTerm:
         return smt.And(
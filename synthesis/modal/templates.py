@@ -138,6 +138,25 @@ class ModalFormulaTemplate(Formula):
         )
 
     def interpret(self, frame: Frame, valuation: Mapping[Atom, smt.SMTFunction], world: smt.SMTTerm) -> smt.SMTTerm:
+        return self.interpret_with_memo(frame, valuation, world, {})
+
+    def interpret_with_memo(
+        self,
+        frame: Frame,
+        valuation: Mapping[Atom, smt.SMTFunction],
+        world: smt.SMTTerm,
+        memo: Dict[Tuple["ModalFormulaTemplate", smt.SMTTerm], smt.SMTTerm],
+    ) -> smt.SMTTerm:
+        """
+        All connectives share the same subformula templates, so the interpretations
+        of (sub)templates at each world are memoized in memo, which is created by
+        the top-level call to interpret (with a fixed frame and valuation)
+        """
+        key = self, world
+        if key in memo:
+            return memo[key]
+
+        subformulas = tuple(_MemoizedSubformula(subformula, memo) for subformula in self.subformulas)
         interp = smt.FALSE()
 
         for node_value in self.node.get_range():
@@ -165,11 +184,12 @@ class ModalFormulaTemplate(Formula):
                 interp = smt.Or(
                     smt.And(
                         self.node.equals(node_value),
-                        connective.construct(*self.subformulas[:arity]).interpret(frame, valuation, world),
+                        connective.construct(*subformulas[:arity]).interpret(frame, valuation, world),
                     ),
                     interp,
                 )
-                
+
+        memo[key] = interp
         return interp
 
     def enumerate(self) -> Generator[Formula, None, None]:
@@ -218,3 +238,29 @@ class ModalFormulaTemplate(Formula):
                             formula = conn.construct(*subformulas)
                             depth_map[depth].append(formula)
                             yield formula
+
+
+class _MemoizedSubformula(Formula):
+    """
+    A subformula template passed to the connectives in ModalFormulaTemplate.interpret_with_memo,
+    so that its interpretations are shared through the memo of the current top-level call
+    """
+
+    def __init__(self, template: ModalFormulaTemplate, memo: Dict[Tuple[ModalFormulaTemplate, smt.SMTTerm], smt.SMTTerm]):
+        self.template = template
+        self.memo = memo
+
+    def get_atoms(self) -> Set[Atom]:
+        return self.template.get_atoms()
+
+    def get_constraint(self) -> smt.SMTTerm:
+        return self.template.get_constraint()
+
+    def get_from_smt_model(self, model: smt.SMTModel) -> Formula:
+        return self.template.get_from_smt_model(model)
+
+    def equals(self, value: Formula) -> smt.SMTTerm:
+        return self.template.equals(value)
+
+    def interpret(self, frame: Frame, valuation: Mapping[Atom, smt.SMTFunction], world: smt.SMTTerm) -> smt.SMTTerm:
+        return self.template.interpret_with_memo(frame, valuation, world, self.memo)
@@ -1,4 +1,4 @@
-from typing import TypeVar, Generic, Iterable, Tuple
+from typing import TypeVar, Generic, Iterable, Tuple, Dict
 
 from abc import ABC, abstractmethod
 
@@ -13,6 +13,8 @@ class Template(Generic[T], ABC):
     Template[T] is a variable/constant in SMT that represents a value of T
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def get_constraint(self) -> smt.SMTTerm: ...
 
@@ -59,6 +61,8 @@ class BoundedIntegerVariable(Template[int]):
         self.lower = lower
         self.upper = upper
         self.variable = smt.FreshSymbol(smt.INT)
+        # equality literals are shared by all constraints mentioning them
+        self._cached_equals: Dict[int, smt.SMTTerm] = {}
 
     def get_constraint(self) -> smt.SMTTerm:
         return smt.And(smt.LE(smt.Int(self.lower), self.variable), smt.LE(self.variable, smt.Int(self.upper)))
@@ -67,7 +71,9 @@ class BoundedIntegerVariable(Template[int]):
         return model[self.variable].constant_value() # type: ignore
 
     def equals(self, value: int) -> smt.SMTTerm:
-        return smt.Equals(self.variable, smt.Int(value))
+        if value not in self._cached_equals:
+            self._cached_equals[value] = smt.Equals(self.variable, smt.Int(value))
+        return self._cached_equals[value]
 
     def get_range(self) -> Iterable[int]:
         return range(self.lower, self.upper + 1)
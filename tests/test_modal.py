@@ -0,0 +1,105 @@
+from typing import Any, List
+
+import io
+import itertools
+
+from synthesis import *
+from synthesis import modal
+from synthesis.utils.stopwatch import Stopwatch
+
+from .base import TestCase
+
+
+theory_map = Parser.parse_theories(r"""
+theory FRAME
+    sort W
+    relation R: W W
+end
+
+theory S4 extending FRAME
+    axiom forall x: W. R(x, x)
+    axiom forall x: W, y: W, z: W. R(x, y) /\ R(y, z) -> R(x, z)
+end
+""")
+
+
+class TestModalSynthesis(TestCase):
+    def synthesize(self, goal_theory_name: str, **kwargs: Any) -> List[modal.Formula]:
+        """
+        Synthesize axioms of depth at most 3 for the given frame theory
+        """
+
+        synthesizer = modal.ModalSynthesizer(theory_map["FRAME"].language, sort_world="W", transition_symbol="R", output=io.StringIO())
+
+        atoms = (modal.Atom("p"),)
+        connectives = (
+            modal.Connective(modal.Falsum, 0),
+            modal.Connective(modal.Implication, 2),
+            modal.Connective(modal.Box, 1),
+            modal.Connective(modal.Diamond, 1),
+        )
+
+        return [
+            formula
+            for formula, formula_type in synthesizer.synthesize(
+                tuple(modal.ModalFormulaTemplate(atoms, connectives, depth) for depth in (1, 2, 3)),
+                theory_map["FRAME"],
+                theory_map[goal_theory_name],
+                check_soundness=True,
+                stopwatch=Stopwatch(),
+                **kwargs,
+            )
+            if formula_type == modal.FormulaResultType.GOOD
+        ]
+
+    def assertModallyEquivalent(self, axioms1: List[modal.Formula], axioms2: List[modal.Formula]) -> None:
+        synthesizer = modal.ModalSynthesizer(theory_map["FRAME"].language, sort_world="W", transition_symbol="R", output=io.StringIO())
+
+        for axiom in axioms1:
+            self.assertTrue(synthesizer.check_modal_entailment(axioms2, axiom), f"{axiom} not entailed by {axioms2}")
+
+        for axiom in axioms2:
+            self.assertTrue(synthesizer.check_modal_entailment(axioms1, axiom), f"{axiom} not entailed by {axioms1}")
+
+    def test_synthesis_rebuild_interval(self) -> None:
+        axioms = self.synthesize("S4")
+        self.assertNotEqual(axioms, [])
+
+        # rebuilding the solver scope may change the candidates found,
+        # but not the logic axiomatized by them
+        for interval in (1, 3):
+            self.assertModallyEquivalent(axioms, self.synthesize("S4", synthesis_rebuild_interval=interval))
+
+    def test_counterexamples_per_query(self) -> None:
+        synthesizer = modal.ModalSynthesizer(theory_map["FRAME"].language, sort_world="W", transition_symbol="R", output=io.StringIO())
+        R = synthesizer.transition_symbol
+        P = RelationSymbol((synthesizer.sort_world,), "P")
+
+        goal_theory = theory_map["FRAME"].expand_language(Language((), (), (P,)))
+        goal_model = FiniteFOModelTemplate(goal_theory, { synthesizer.sort_world: 2 }, exact_size=True)
+        carrier = goal_model.interpret_sort(synthesizer.sort_world)
+        assert isinstance(carrier, FiniteCarrierSet)
+        worlds = carrier.domain
+
+        with smt.Solver(name="z3") as solver:
+            solver.add_assertion(goal_model.get_constraint())
+
+            trigger = smt.FreshSymbol(smt.BOOL)
+            models = synthesizer.get_counterexample_models(solver, goal_model, trigger, 4)
+            self.assertEqual(len(models), 4)
+
+            # the frames are pairwise distinct
+            frames = {
+                tuple(model.get_value(goal_model.interpret_relation(R, *pair)).is_true() for pair in itertools.product(worlds, repeat=2))
+                for model in models
+            }
+            self.assertEqual(len(frames), 4)
+
+            # only the first 3 frames are blocked (the last one is not
+            # blocked since no more models are requested)
+            self.assertEqual(len(synthesizer.get_counterexample_models(solver, goal_model, trigger, 16)), 13)
+
+            # blocking is guarded by the trigger
+            self.assertTrue(solver.solve())
+
+        self.assertModallyEquivalent(self.synthesize("S4"), self.synthesize("S4", counterexamples_per_query=4))
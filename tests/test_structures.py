@@ -0,0 +1,72 @@
+from typing import Optional, Tuple
+
+from synthesis import *
+
+from .base import TestCase
+
+
+class TestStructureTemplates(TestCase):
+    def count_models(self, model: FiniteFOModelTemplate, symbols: Optional[Tuple[RelationSymbol, ...]] = None) -> int:
+        """
+        Count models of the template up to the diagram of the given symbols
+        """
+        count = 0
+
+        with smt.Solver(name="z3") as solver:
+            solver.add_assertion(model.get_constraint())
+
+            while solver.solve():
+                solver.add_assertion(smt.Not(model.get_diagram_constraint(solver.get_model(), symbols=symbols)))
+                count += 1
+
+        return count
+
+    def test_diagram_constraint(self) -> None:
+        sort_a = Sort("A")
+
+        R = RelationSymbol((sort_a, sort_a), "R")
+        P = RelationSymbol((sort_a,), "P")
+
+        theory = Theory(Language((sort_a,), (), (R, P)), {}, ())
+        model = FiniteFOModelTemplate(theory, { sort_a: 2 }, exact_size=True)
+
+        # all binary relations on 2 elements, paired with all unary relations
+        self.assertEqual(self.count_models(model), 16 * 4)
+
+        # only R is blocked
+        self.assertEqual(self.count_models(model, (R,)), 16)
+        self.assertEqual(self.count_models(model, (P,)), 4)
+
+    def test_fixpoint_definition_capture(self) -> None:
+        theory = Parser.parse_theory(r"""
+        theory GRAPH
+            sort S
+            relation e: S S
+            relation r: S
+            fixpoint r(x) = exists y: S. e(x, y) /\ r(y)
+        end
+        """)
+
+        definition, = theory.get_fixpoint_definitions()
+        model = FOProvableStructureTemplate(theory, 1)
+
+        # the body of the definition is shared with the formula below and
+        # has been interpreted (then substituted into) when unfolding r
+        x, = definition.variables
+        e = theory.language.get_relation_symbol("e")
+        sort_s = theory.language.get_sort("S")
+        y = Variable("y1", sort_s)
+        z = Variable("z1", sort_s)
+
+        # r(y) unfolds to exists z. e(y, z) /\ r(z), so the body implies a path of length 2
+        formula = UniversalQuantification(x, Implication(
+            definition.definition,
+            ExistentialQuantification(y, ExistentialQuantification(z, Conjunction(
+                RelationApplication(e, (x, y)),
+                RelationApplication(e, (y, z)),
+            ))),
+        ))
+
+        with smt.Solver(name="z3") as solver:
+            solver.add_assertion(smt.Not(formula.interpret(model, {})))
+            self.assertFalse(solver.solve())
@@ -1,3 +1,5 @@
+import pickle
+
 from synthesis import *
 
 from .base import TestCase
@@ -78,3 +80,84 @@ class TestSyntax(TestCase):
             self.enumerate(UniversalQuantification(x, RelationApplication(R, (x, y)))),
             { UniversalQuantification(x, RelationApplication(R, (x, y))) },
         )
+
+    def test_language_membership(self) -> None:
+        sort_a = Sort("A")
+        sort_b = Sort("B")
+
+        # overloaded symbols with the same name
+        f_a = FunctionSymbol((sort_a,), sort_a, "f")
+        f_b = FunctionSymbol((sort_b,), sort_b, "f")
+        R_a = RelationSymbol((sort_a,), "R")
+        R_b = RelationSymbol((sort_b,), "R")
+
+        language = Language((sort_a, sort_b), (f_a, f_b), (R_a, R_b))
+
+        self.assertTrue(language.has_sort(sort_b))
+        self.assertTrue(language.has_function_symbol(f_a))
+        self.assertTrue(language.has_function_symbol(f_b))
+        self.assertTrue(language.has_relation_symbol(R_a))
+        self.assertTrue(language.has_relation_symbol(R_b))
+
+        self.assertFalse(language.has_sort(Sort("C")))
+        self.assertFalse(language.has_function_symbol(FunctionSymbol((sort_a,), sort_b, "f")))
+        self.assertFalse(language.has_relation_symbol(RelationSymbol((sort_a, sort_a), "R")))
+
+        # get_* still resolves names to the first symbol
+        self.assertIs(language.get_function_symbol("f"), f_a)
+        self.assertIs(language.get_relation_symbol("R"), R_a)
+
+    def test_variable_interning(self) -> None:
+        sort_a = Sort("A")
+        sort_a_smt = Sort("A", smt_hook=smt.INT)
+
+        self.assertIs(Variable("x", sort_a), Variable("x", sort_a))
+        self.assertIsNot(Variable("x", sort_a), Variable("y", sort_a))
+
+        # variables with equal but distinct sort objects are not interned together
+        self.assertIsNot(Variable("x", sort_a), Variable("x", sort_a_smt))
+        self.assertEqual(Variable("x", sort_a), Variable("x", sort_a_smt))
+
+        self.assertIs(Verum(), Verum())
+        self.assertIs(Falsum(), Falsum())
+
+    def test_pickle(self) -> None:
+        sort_a = Sort("A")
+
+        f = FunctionSymbol((sort_a, sort_a), sort_a, "f")
+        c = FunctionSymbol((), sort_a, "c")
+        R = RelationSymbol((sort_a, sort_a), "R")
+
+        language = Language((sort_a,), (f, c), (R,))
+
+        x = Variable("x", sort_a)
+        y = Variable("y", sort_a)
+
+        formula = UniversalQuantification(x, Disjunction(
+            RelationApplication(R, (x, Application(f, (y, Application(c, ()))))),
+            Conjunction(Verum(), Falsum()),
+        ))
+        formula.get_free_variables() # populate the cache on the nodes
+
+        language_copy = pickle.loads(pickle.dumps(language))
+        self.assertEqual(language_copy, language)
+        self.assertEqual(language_copy.get_function_symbol("f"), f)
+        self.assertTrue(language_copy.has_relation_symbol(R))
+
+        formula_copy = pickle.loads(pickle.dumps(formula))
+        self.assertEqual(formula_copy, formula)
+        self.assertEqual(hash(formula_copy), hash(formula))
+        self.assertEqual(formula_copy.get_free_variables(), { y })
+        self.assertTrue(formula_copy.body.left.arguments[1].is_in_language(language_copy))
+
+        # Verum and Falsum are singletons
+        self.assertIs(formula_copy.body.right.left, Verum())
+        self.assertIs(formula_copy.body.right.right, Falsum())
+
+        # an unpickled variable is equal to, but not the same object as, the original
+        # (since the sort is unpickled as a new object), but it is still interned
+        x_copy = pickle.loads(pickle.dumps(x))
+        self.assertEqual(x_copy, x)
+        self.assertIsNot(x_copy, x)
+        self.assertIs(Variable("x", x_copy.sort), x_copy)
+        self.assertIs(formula_copy.variable, formula_copy.body.left.arguments[0])
@@ -304,3 +304,76 @@ class TestFormulaTemplates(TestCase):
             Application(f, (x, y)),
             Application(f, (x, Application(g, (x,)))),
         })
+
+    def test_term_template_lazy_subterms(self) -> None:
+        sort_a = Sort("A")
+
+        f = FunctionSymbol((sort_a, sort_a), sort_a, "f")
+        c = FunctionSymbol((), sort_a, "c")
+
+        x = Variable("x", sort_a)
+        y = Variable("y", sort_a)
+
+        language = Language((sort_a,), (f, c), ())
+
+        template = TermTemplate(language, (x,), 2)
+
+        # enumeration does not need the subtree of control variables
+        list(template.enumerate())
+        self.assertIsNone(template._subterms)
+
+        subterms = template.subterms
+        self.assertEqual(len(subterms), 2)
+        self.assertIs(template.subterms, subterms)
+        self.assertTrue(all(subterm._subterms is None for subterm in subterms))
+
+        # substitution of variables not in the template is the identity
+        self.assertIs(template.substitute({ y: Application(c, ()) }), template)
+
+        # the substituted template shares control variables with the original one
+        substituted = template.substitute({ x: Application(c, ()) })
+        self.assertIsNot(substituted, template)
+        self.assertIs(substituted.node, template.node)
+
+        for subterm, substituted_subterm in zip(template.subterms, substituted.subterms):
+            self.assertIs(substituted_subterm.node, subterm.node)
+            self.assertIs(substituted_subterm.subterms[0].node, subterm.subterms[0].node)
+
+        self.assertEqual(template.get_free_variables(), { x })
+        self.assertEqual(substituted.get_free_variables(), set())
+
+        # so both can be read off the same model
+        with smt.Solver(name="z3") as solver:
+            solver.add_assertion(template.get_constraint())
+            solver.add_assertion(template.equals(Application(f, (x, Application(c, ())))))
+            self.assertTrue(solver.solve())
+
+            model = solver.get_model()
+            self.assertEqual(substituted.get_from_smt_model(model), Application(f, (Application(c, ()), Application(c, ()))))
+
+    def test_term_template_equality(self) -> None:
+        sort_a = Sort("A")
+        sort_b = Sort("B")
+
+        c = FunctionSymbol((), sort_a, "c")
+
+        x = Variable("x", sort_a)
+        y = Variable("y", sort_b)
+
+        # a symbol occurring twice in the language can be chosen at either position
+        language = Language((sort_a,), (c, c), ())
+        template = TermTemplate(language, (), 0)
+
+        with smt.Solver(name="z3") as solver:
+            solver.add_assertion(template.get_constraint())
+            solver.add_assertion(smt.Not(template.equals(Application(c, ()))))
+            self.assertFalse(solver.solve())
+
+        # substitutions are not checked for sorting, so the variable
+        # branch is kept even if the substituted term has a different sort
+        substituted = TermTemplate(Language((sort_a, sort_b), (), ()), (x,), 0).substitute({ x: y })
+
+        with smt.Solver(name="z3") as solver:
+            solver.add_assertion(substituted.equals(y))
+            self.assertTrue(solver.solve())
+            self.assertEqual(substituted.get_from_smt_model(solver.get_model()), y)